@@ -0,0 +1,30 @@
+"""added updated_at columns
+
+Revision ID: 3f1c9a2b7e40
+Revises: 7d658a69d1ad
+Create Date: 2026-10-19 10:12:41.302118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a2b7e40'
+down_revision: Union[str, Sequence[str], None] = '7d658a69d1ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('buildings', 'activities', 'organizations'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('organizations', 'activities', 'buildings'):
+        op.drop_column(table, 'updated_at')
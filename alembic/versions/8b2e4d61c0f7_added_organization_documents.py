@@ -0,0 +1,62 @@
+"""added organization documents
+
+Revision ID: 8b2e4d61c0f7
+Revises: 3f1c9a2b7e40
+Create Date: 2026-10-19 14:03:27.518903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d61c0f7'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a2b7e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'organization_documents',
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('building_id', sa.Integer(), nullable=False),
+        sa.Column('address', sa.String(length=255), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('activities', postgresql.JSONB(), nullable=False),
+        sa.Column('activity_path_ids', postgresql.JSONB(), nullable=False),
+        sa.Column('phone_numbers', postgresql.JSONB(), nullable=False),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('organization_id')
+    )
+    op.create_index(op.f('ix_organization_documents_name'), 'organization_documents', ['name'], unique=False)
+    op.create_index(op.f('ix_organization_documents_building_id'), 'organization_documents', ['building_id'], unique=False)
+    op.create_index(
+        'ix_organization_documents_activity_path_ids',
+        'organization_documents',
+        ['activity_path_ids'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'activity_path_ids': 'jsonb_path_ops'}
+    )
+    # Substring name search (ILIKE '%...%') on the read model
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        'CREATE INDEX ix_organization_documents_name_trgm '
+        'ON organization_documents USING gin (name gin_trgm_ops)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_organization_documents_name_trgm', table_name='organization_documents')
+    op.drop_index('ix_organization_documents_activity_path_ids', table_name='organization_documents')
+    op.drop_index(op.f('ix_organization_documents_building_id'), table_name='organization_documents')
+    op.drop_index(op.f('ix_organization_documents_name'), table_name='organization_documents')
+    op.drop_table('organization_documents')
@@ -0,0 +1,34 @@
+"""added link table and building location indexes
+
+Revision ID: a8c1e4f7b352
+Revises: f4b82c6d0e19
+Create Date: 2026-10-20 01:04:18.662930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c1e4f7b352'
+down_revision: Union[str, Sequence[str], None] = 'f4b82c6d0e19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_organization_phones_organization_id'), 'organization_phones', ['organization_id'], unique=False)
+    op.create_index(op.f('ix_organization_activities_organization_id'), 'organization_activities', ['organization_id'], unique=False)
+    op.create_index(op.f('ix_organization_activities_activity_id'), 'organization_activities', ['activity_id'], unique=False)
+    op.create_index('ix_buildings_region_location', 'buildings', ['region', 'latitude', 'longitude'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_buildings_region_location', table_name='buildings')
+    op.drop_index(op.f('ix_organization_activities_activity_id'), table_name='organization_activities')
+    op.drop_index(op.f('ix_organization_activities_organization_id'), table_name='organization_activities')
+    op.drop_index(op.f('ix_organization_phones_organization_id'), table_name='organization_phones')
@@ -0,0 +1,89 @@
+"""added region foreign keys
+
+Revision ID: b5e0d7c94a21
+Revises: a8c1e4f7b352
+Create Date: 2026-10-20 10:42:51.208374
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e0d7c94a21'
+down_revision: Union[str, Sequence[str], None] = 'a8c1e4f7b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REFERENCED_TABLES = ['buildings', 'activities', 'organizations']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    misplaced = 0 if context.is_offline_mode() else op.get_bind().execute(sa.text(
+        "SELECT count(*) FROM organizations JOIN buildings ON buildings.id = organizations.building_id "
+        "WHERE buildings.region <> organizations.region"
+    )).scalar()
+    if misplaced:
+        raise RuntimeError(
+            f"{misplaced} organizations reference a building of another region; "
+            "move or delete them before upgrading"
+        )
+
+    for table in REFERENCED_TABLES:
+        op.create_unique_constraint(f'uq_{table}_region_id', table, ['region', 'id'])
+
+    op.add_column('organization_activities', sa.Column('region', sa.String(length=32), nullable=True))
+    op.execute(
+        "UPDATE organization_activities SET region = organizations.region "
+        "FROM organizations WHERE organizations.id = organization_activities.organization_id"
+    )
+    # Links without an organization or to an activity of another region were never visible to reads
+    op.execute("DELETE FROM organization_activities WHERE region IS NULL")
+    op.execute(
+        "DELETE FROM organization_activities USING activities "
+        "WHERE activities.id = organization_activities.activity_id "
+        "AND activities.region <> organization_activities.region"
+    )
+    op.alter_column('organization_activities', 'region', existing_type=sa.String(length=32), nullable=False)
+
+    op.drop_constraint(op.f('organizations_building_id_fkey'), 'organizations', type_='foreignkey')
+    op.create_foreign_key(
+        'organizations_region_building_id_fkey', 'organizations', 'buildings',
+        ['region', 'building_id'], ['region', 'id'], ondelete='CASCADE'
+    )
+    op.drop_constraint(op.f('organization_activities_organization_id_fkey'), 'organization_activities', type_='foreignkey')
+    op.drop_constraint(op.f('organization_activities_activity_id_fkey'), 'organization_activities', type_='foreignkey')
+    op.create_foreign_key(
+        'organization_activities_region_organization_id_fkey', 'organization_activities', 'organizations',
+        ['region', 'organization_id'], ['region', 'id'], ondelete='CASCADE'
+    )
+    op.create_foreign_key(
+        'organization_activities_region_activity_id_fkey', 'organization_activities', 'activities',
+        ['region', 'activity_id'], ['region', 'id'], ondelete='CASCADE'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('organization_activities_region_activity_id_fkey', 'organization_activities', type_='foreignkey')
+    op.drop_constraint('organization_activities_region_organization_id_fkey', 'organization_activities', type_='foreignkey')
+    op.create_foreign_key(
+        op.f('organization_activities_activity_id_fkey'), 'organization_activities', 'activities',
+        ['activity_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_foreign_key(
+        op.f('organization_activities_organization_id_fkey'), 'organization_activities', 'organizations',
+        ['organization_id'], ['id'], ondelete='CASCADE'
+    )
+    op.drop_constraint('organizations_region_building_id_fkey', 'organizations', type_='foreignkey')
+    op.create_foreign_key(
+        op.f('organizations_building_id_fkey'), 'organizations', 'buildings',
+        ['building_id'], ['id'], ondelete='CASCADE'
+    )
+    op.drop_column('organization_activities', 'region')
+
+    for table in reversed(REFERENCED_TABLES):
+        op.drop_constraint(f'uq_{table}_region_id', table, type_='unique')
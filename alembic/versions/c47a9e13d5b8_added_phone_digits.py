@@ -0,0 +1,41 @@
+"""added phone digits
+
+Revision ID: c47a9e13d5b8
+Revises: 8b2e4d61c0f7
+Create Date: 2026-10-19 16:41:09.774215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a9e13d5b8'
+down_revision: Union[str, Sequence[str], None] = '8b2e4d61c0f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('organization_phones', sa.Column('phone_digits', sa.String(length=20), server_default='', nullable=False))
+    op.execute("UPDATE organization_phones SET phone_digits = regexp_replace(phone_number, '\\D', '', 'g')")
+    # Prefix lookups (LIKE 'digits%') and substring lookups (LIKE '%digits%')
+    op.execute(
+        'CREATE INDEX ix_organization_phones_phone_digits_prefix '
+        'ON organization_phones (phone_digits text_pattern_ops)'
+    )
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        'CREATE INDEX ix_organization_phones_phone_digits_trgm '
+        'ON organization_phones USING gin (phone_digits gin_trgm_ops)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_organization_phones_phone_digits_trgm', table_name='organization_phones')
+    op.drop_index('ix_organization_phones_phone_digits_prefix', table_name='organization_phones')
+    op.drop_column('organization_phones', 'phone_digits')
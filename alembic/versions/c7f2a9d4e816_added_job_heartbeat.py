@@ -0,0 +1,28 @@
+"""added job heartbeat
+
+Revision ID: c7f2a9d4e816
+Revises: b5e0d7c94a21
+Create Date: 2026-10-21 09:17:36.524811
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f2a9d4e816'
+down_revision: Union[str, Sequence[str], None] = 'b5e0d7c94a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'heartbeat_at')
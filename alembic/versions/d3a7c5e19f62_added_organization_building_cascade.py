@@ -0,0 +1,30 @@
+"""added organization building cascade
+
+Revision ID: d3a7c5e19f62
+Revises: b6d21f0e8a47
+Create Date: 2026-10-19 21:47:12.384105
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a7c5e19f62'
+down_revision: Union[str, Sequence[str], None] = 'b6d21f0e8a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint(op.f('organizations_building_id_fkey'), 'organizations', type_='foreignkey')
+    op.create_foreign_key(op.f('organizations_building_id_fkey'), 'organizations', 'buildings', ['building_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(op.f('organizations_building_id_fkey'), 'organizations', type_='foreignkey')
+    op.create_foreign_key(op.f('organizations_building_id_fkey'), 'organizations', 'buildings', ['building_id'], ['id'])
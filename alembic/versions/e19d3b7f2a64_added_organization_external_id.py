@@ -0,0 +1,30 @@
+"""added organization external id
+
+Revision ID: e19d3b7f2a64
+Revises: c47a9e13d5b8
+Create Date: 2026-10-19 18:22:53.106847
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e19d3b7f2a64'
+down_revision: Union[str, Sequence[str], None] = 'c47a9e13d5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('organizations', sa.Column('external_id', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_organizations_external_id'), 'organizations', ['external_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_organizations_external_id'), table_name='organizations')
+    op.drop_column('organizations', 'external_id')
@@ -0,0 +1,51 @@
+"""added regions
+
+Revision ID: f4b82c6d0e19
+Revises: d3a7c5e19f62
+Create Date: 2026-10-19 23:12:40.517306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b82c6d0e19'
+down_revision: Union[str, Sequence[str], None] = 'd3a7c5e19f62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REGIONAL_TABLES = ['buildings', 'activities', 'organizations', 'organization_documents', 'changes', 'jobs']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in REGIONAL_TABLES:
+        op.add_column(table, sa.Column('region', sa.String(length=32), server_default='default', nullable=False))
+
+    # Uniqueness is per region now; the region-leading indexes serve the per-region lookups
+    op.drop_index(op.f('ix_buildings_address'), table_name='buildings')
+    op.create_index('ix_buildings_region_address', 'buildings', ['region', 'address'], unique=True)
+    op.drop_index(op.f('ix_organizations_external_id'), table_name='organizations')
+    op.create_index('ix_organizations_region_external_id', 'organizations', ['region', 'external_id'], unique=True)
+    op.create_index('ix_organizations_region_building_id', 'organizations', ['region', 'building_id'], unique=False)
+    op.create_index('ix_activities_region_parent_id', 'activities', ['region', 'parent_id'], unique=False)
+    op.create_index('ix_organization_documents_region_organization_id', 'organization_documents', ['region', 'organization_id'], unique=False)
+    op.create_index('ix_changes_region_id', 'changes', ['region', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_changes_region_id', table_name='changes')
+    op.drop_index('ix_organization_documents_region_organization_id', table_name='organization_documents')
+    op.drop_index('ix_activities_region_parent_id', table_name='activities')
+    op.drop_index('ix_organizations_region_building_id', table_name='organizations')
+    op.drop_index('ix_organizations_region_external_id', table_name='organizations')
+    op.create_index(op.f('ix_organizations_external_id'), 'organizations', ['external_id'], unique=True)
+    op.drop_index('ix_buildings_region_address', table_name='buildings')
+    op.create_index(op.f('ix_buildings_address'), 'buildings', ['address'], unique=True)
+
+    for table in reversed(REGIONAL_TABLES):
+        op.drop_column(table, 'region')
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 
 from ..dao import dao
-from .. import schemas, dependencies
+from .. import schemas, dependencies, conditional
 from ..database import get_db
 
 router = APIRouter()
@@ -20,10 +20,13 @@ def read_activities(
 
 @router.get("/tree", response_model=List[schemas.ActivityWithLevel])
 def read_activities_tree(
+    request: Request,
+    response: Response,
     max_level: int = 3,
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
+    conditional.check_not_modified(request, response, "activities_tree", dao.get_activities_version(db), max_level)
     activities = dao.get_activities_tree(db, max_level=max_level)
     return activities
 
@@ -44,4 +47,7 @@ def create_activity(
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    return dao.create_activity(db=db, activity=activity)
\ No newline at end of file
+    try:
+        return dao.create_activity(db=db, activity=activity)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
\ No newline at end of file
@@ -1,23 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 
 from ..dao import dao
-from .. import schemas, dependencies
+from .. import schemas, dependencies, conditional
 from ..database import get_db
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Building])
 def read_buildings(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
+    conditional.check_not_modified(request, response, "buildings", dao.get_buildings_version(db), skip, limit)
     buildings = dao.get_buildings(db, skip=skip, limit=limit)
     return buildings
 
+@router.put("/", response_model=List[schemas.Building])
+def upsert_buildings(
+    buildings: List[schemas.BuildingCreate],
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    return dao.upsert_buildings(db=db, buildings=buildings)
+
 @router.get("/{building_id}", response_model=schemas.Building)
 def read_building(
     building_id: int,
@@ -35,4 +46,15 @@ def create_building(
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    return dao.create_building(db=db, building=building)
\ No newline at end of file
+    return dao.create_building(db=db, building=building)
+
+@router.delete("/{building_id}")
+def delete_building(
+    building_id: int,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    deleted = dao.delete_building(db, building_id=building_id)
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Building not found")
+    return {"message": "Building deleted successfully", "deleted_organizations": deleted}
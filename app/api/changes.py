@@ -0,0 +1,42 @@
+import json
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..dao import dao
+from .. import dependencies, regions
+from ..database import session_for
+
+router = APIRouter()
+
+STREAM_BATCH_SIZE = 500
+
+@router.get("/")
+def read_changes(
+    request: Request,
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=100000),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    """Stream the region's changes after the `since` cursor as NDJSON, oldest first.
+
+    Each line carries its `seq`; pass the last one back as `since` to continue.
+    """
+    region = regions.from_request(request)
+
+    def stream():
+        # The session lives as long as the stream, not the request handler
+        db = regions.use(session_for(request), region)
+        try:
+            for change in dao.get_changes(db, since=since, limit=limit).yield_per(STREAM_BATCH_SIZE):
+                yield json.dumps({
+                    "seq": change.id,
+                    "entity": change.entity,
+                    "entity_id": change.entity_id,
+                    "operation": change.operation,
+                    "changed_at": change.changed_at.isoformat()
+                }) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from .. import schemas, dependencies, jobs
+from ..database import get_db
+
+router = APIRouter()
+
+@router.post("/", response_model=schemas.Job, status_code=202)
+def submit_job(
+    job: schemas.JobCreate,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    if job.kind not in jobs.HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {job.kind}")
+    try:
+        return jobs.submit(db, job)
+    except jobs.JobTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+
+@router.get("/{job_id}", response_model=schemas.Job)
+def read_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    job = jobs.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/{job_id}/cancel", response_model=schemas.Job)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    job = jobs.cancel(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,31 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 
-from .. import schemas, dependencies
-from ..database import get_db
+from .. import schemas, dependencies, conditional, query_guard
+from ..database import get_db, get_read_db
 from ..dao import dao
 
 
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.Organization])
+def _format_organizations(organizations, response_format: schemas.ResponseFormat):
+    if response_format == schemas.ResponseFormat.normalized:
+        return schemas.NormalizedOrganizationList.from_organizations(organizations)
+    return organizations
+
+@router.get("/", response_model=schemas.OrganizationList)
 def read_organizations(
     skip: int = 0,
     limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
+    query_guard.check_limit(limit)
     organizations = dao.get_organizations(db, skip=skip, limit=limit)
-    return organizations
+    return _format_organizations(organizations, response_format)
 
 @router.get("/{organization_id}", response_model=schemas.Organization)
 def read_organization(
     organization_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
+    version = dao.get_organization_version(db, organization_id=organization_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    conditional.check_not_modified(request, response, "organization", organization_id, version)
+
     organization = dao.get_organization(db, organization_id=organization_id)
     if organization is None:
         raise HTTPException(status_code=404, detail="Organization not found")
@@ -37,7 +51,21 @@ def create_organization(
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    return dao.create_organization(db=db, organization=organization)
+    try:
+        return dao.create_organization(db=db, organization=organization)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+@router.put("/", response_model=List[schemas.OrganizationUpsertResult])
+def upsert_organizations(
+    organizations: List[schemas.OrganizationUpsert],
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    try:
+        return dao.upsert_organizations(db=db, organizations=organizations)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
 
 @router.put("/{organization_id}", response_model=schemas.Organization)
 def update_organization(
@@ -46,11 +74,43 @@ def update_organization(
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organization = dao.update_organization(db, organization_id=organization_id, organization_update=organization_update)
+    try:
+        organization = dao.update_organization(db, organization_id=organization_id, organization_update=organization_update)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     if organization is None:
         raise HTTPException(status_code=404, detail="Organization not found")
     return organization
 
+@router.patch("/{organization_id}/phones", response_model=schemas.OrganizationPhones)
+def patch_organization_phones(
+    organization_id: int,
+    patch: schemas.PhonesPatch,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    phones = dao.patch_organization_phones(db, organization_id=organization_id, add=patch.add, remove=patch.remove)
+    if phones is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    return phones
+
+@router.patch("/{organization_id}/activities", response_model=schemas.OrganizationActivities)
+def patch_organization_activities(
+    organization_id: int,
+    patch: schemas.ActivitiesPatch,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    try:
+        activities = dao.patch_organization_activities(
+            db, organization_id=organization_id, add=patch.add, remove=patch.remove
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if activities is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    return activities
+
 @router.delete("/{organization_id}")
 def delete_organization(
     organization_id: int,
@@ -62,70 +122,140 @@ def delete_organization(
         raise HTTPException(status_code=404, detail="Organization not found")
     return {"message": "Organization deleted successfully"}
 
-@router.get("/building/{building_id}", response_model=List[schemas.Organization])
-def get_organizations_by_building(
+@router.delete("/", response_model=schemas.DeletedOrganizations)
+def delete_organizations(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    return schemas.DeletedOrganizations(deleted_ids=dao.delete_organizations(db, organization_ids=ids))
+
+@router.delete("/building/{building_id}", response_model=schemas.DeletedOrganizations)
+def delete_organizations_by_building(
     building_id: int,
     db: Session = Depends(get_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organizations = dao.get_organizations_by_building(db, building_id=building_id)
-    return organizations
+    return schemas.DeletedOrganizations(deleted_ids=dao.delete_organizations_by_building(db, building_id=building_id))
+
+@router.get("/building/{building_id}", response_model=schemas.OrganizationList)
+def get_organizations_by_building(
+    building_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    query_guard.check_limit(limit)
+    organizations = dao.get_organizations_by_building(db, building_id=building_id, skip=skip, limit=limit)
+    return _format_organizations(organizations, response_format)
 
-@router.get("/activity/{activity_id}", response_model=List[schemas.Organization])
+@router.get("/activity/{activity_id}", response_model=schemas.OrganizationList)
 def get_organizations_by_activity(
     activity_id: int,
-    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organizations = dao.get_organizations_by_activity(db, activity_id=activity_id)
-    return organizations
+    query_guard.check_limit(limit)
+    organizations = dao.get_organizations_by_activity(db, activity_id=activity_id, skip=skip, limit=limit)
+    return _format_organizations(organizations, response_format)
 
-@router.post("/search/radius", response_model=List[schemas.Organization])
+@router.post("/search/radius", response_model=schemas.OrganizationList)
 def search_organizations_in_radius(
     search: schemas.RadiusSearch,
-    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organizations = dao.get_organizations_in_radius(db, center=search.center, radius_km=search.radius_km)
-    return organizations
+    query_guard.check_radius(search.radius_km)
+    query_guard.check_limit(limit)
+    organizations = dao.get_organizations_in_radius(
+        db, center=search.center, radius_km=search.radius_km, skip=skip, limit=limit
+    )
+    return _format_organizations(organizations, response_format)
 
-@router.post("/search/rectangle", response_model=List[schemas.Organization])
+@router.post("/search/rectangle", response_model=schemas.OrganizationList)
 def search_organizations_in_rectangle(
     search: schemas.RectangleSearch,
-    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organizations = dao.get_organizations_in_rectangle(db, north_east=search.north_east, south_west=search.south_west)
-    return organizations
+    query_guard.check_limit(limit)
+    organizations = dao.get_organizations_in_rectangle(
+        db, north_east=search.north_east, south_west=search.south_west, skip=skip, limit=limit
+    )
+    return _format_organizations(organizations, response_format)
+
+@router.post("/search/nearest", response_model=schemas.OrganizationList)
+def search_nearest_organizations(
+    search: schemas.NearestSearch,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    query_guard.check_limit(search.limit)
+    organizations = dao.get_nearest_organizations(db, center=search.center, limit=search.limit)
+    return _format_organizations(organizations, response_format)
 
-@router.get("/search/name/{name}", response_model=List[schemas.Organization])
+@router.get("/search/name/{name}", response_model=schemas.OrganizationList)
 def search_organizations_by_name(
     name: str,
-    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organizations = dao.search_organizations_by_name(db, name=name)
-    return organizations
+    query_guard.check_pattern(name, "name")
+    query_guard.check_limit(limit)
+    organizations = dao.search_organizations_by_name(db, name=name, skip=skip, limit=limit)
+    return _format_organizations(organizations, response_format)
 
-@router.get("/search/activity/{activity_name}", response_model=List[schemas.Organization])
+@router.get("/search/activity/{activity_name}", response_model=schemas.OrganizationList)
 def search_organizations_by_activity_tree(
     activity_name: str,
-    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organizations = dao.search_organizations_by_activity_tree(db, activity_name=activity_name)
-    return organizations
+    query_guard.check_pattern(activity_name, "activity_name")
+    query_guard.check_limit(limit)
+    organizations = dao.search_organizations_by_activity_tree(
+        db, activity_name=activity_name, skip=skip, limit=limit
+    )
+    return _format_organizations(organizations, response_format)
 
-@router.get("/search/phone/{phone_pattern}", response_model=List[schemas.Organization])
+@router.get("/search/phone/{phone_pattern}", response_model=schemas.OrganizationList)
 def search_organizations_by_phone(
     phone_pattern: str,
-    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    db: Session = Depends(dependencies.get_search_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
-    organizations = dao.get_organizations_with_phones_by_pattern(db, phone_pattern=phone_pattern)
-    return organizations
+    query_guard.check_pattern(phone_pattern, "phone_pattern")
+    query_guard.check_limit(limit)
+    organizations = dao.get_organizations_with_phones_by_pattern(
+        db, phone_pattern=phone_pattern, skip=skip, limit=limit
+    )
+    return _format_organizations(organizations, response_format)
 
-@router.get("/search/comprehensive/", response_model=List[schemas.Organization])
+@router.get(
+    "/search/comprehensive/",
+    response_model=Union[schemas.OrganizationList, schemas.FacetedOrganizationSearch]
+)
 def search_organizations_comprehensive(
     name: Optional[str] = Query(None),
     building_id: Optional[int] = Query(None),
@@ -133,9 +263,15 @@ def search_organizations_comprehensive(
     activity_name: Optional[str] = Query(None),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    response_format: schemas.ResponseFormat = Query(schemas.ResponseFormat.full, alias="format"),
+    facets: bool = False,
+    facet_limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(dependencies.get_search_db),
     api_key: str = Depends(dependencies.verify_api_key)
 ):
+    query_guard.check_pattern(name, "name")
+    query_guard.check_pattern(activity_name, "activity_name")
+    query_guard.check_limit(limit)
     organizations = dao.search_organizations_comprehensive(
         db,
         name=name,
@@ -145,4 +281,45 @@ def search_organizations_comprehensive(
         skip=skip,
         limit=limit
     )
-    return organizations
\ No newline at end of file
+    if not facets:
+        return _format_organizations(organizations, response_format)
+
+    # With facets the page is wrapped: {"organizations": [...], "facets": {...}}
+    if response_format == schemas.ResponseFormat.normalized:
+        organizations = schemas.NormalizedOrganizationList.from_organizations(organizations)
+    result = schemas.FacetedOrganizationSearch(
+        organizations=organizations,
+        facets=dao.get_search_facets(
+            db,
+            name=name,
+            building_id=building_id,
+            activity_id=activity_id,
+            activity_name=activity_name,
+            limit=facet_limit
+        )
+    )
+    return result
+
+@router.get("/stats/activities", response_model=List[schemas.ActivityCount])
+def count_organizations_by_activity(
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    return dao.count_organizations_by_activity(db)
+
+@router.get("/stats/buildings", response_model=List[schemas.BuildingCount])
+def count_organizations_by_building(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    return dao.count_organizations_by_building(db, skip=skip, limit=limit)
+
+@router.post("/stats/grid", response_model=List[schemas.GridCellCount])
+def count_organizations_in_grid(
+    grid: schemas.GridStatsRequest,
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    return dao.count_organizations_in_grid(db, grid=grid)
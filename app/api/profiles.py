@@ -0,0 +1,35 @@
+from enum import Enum
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from .. import profiling
+
+router = APIRouter()
+
+class ProfileFormat(str, Enum):
+    speedscope = "speedscope"
+    collapsed = "collapsed"
+    raw = "raw"
+
+@router.get("/{profile_id}")
+def download_profile(
+    profile_id: str,
+    profile_format: ProfileFormat = ProfileFormat.speedscope,
+    token: str = Depends(profiling.verify_profiling_token)
+):
+    profile = profiling.load(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if profile_format == ProfileFormat.collapsed:
+        return PlainTextResponse(
+            profiling.to_collapsed(profile),
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed.txt"'}
+        )
+    if profile_format == ProfileFormat.speedscope:
+        return JSONResponse(
+            profiling.to_speedscope(profile),
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'}
+        )
+    return profile
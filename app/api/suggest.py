@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..dao import dao
+from .. import schemas, dependencies
+from ..database import get_db
+
+router = APIRouter()
+
+@router.get("", response_model=schemas.Suggestions)
+def suggest(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(dependencies.verify_api_key)
+):
+    return dao.suggest(db, query=q, limit=limit)
@@ -0,0 +1,131 @@
+import gzip
+import io
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+from .config import settings
+
+
+class GzipResponder(IdentityResponder):
+    """Gzip responder that sync-flushes every streamed chunk so clients see data without waiting for the end"""
+    content_encoding = "gzip"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int) -> None:
+        super().__init__(app, minimum_size)
+        self.buffer = io.BytesIO()
+        self.file = gzip.GzipFile(mode="wb", fileobj=self.buffer, compresslevel=min(level, 9))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        with self.buffer, self.file:
+            await super().__call__(scope, receive, send)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        self.file.write(body)
+        if more_body:
+            self.file.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            self.file.close()
+
+        body = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return body
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=min(level, 11))
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        if more_body:
+            return data + self.compressor.flush()
+        return data + self.compressor.finish()
+
+
+class ZstdResponder(IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.compress(body)
+        if more_body:
+            return data + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return data + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+RESPONDERS = {"gzip": GzipResponder}
+if brotli is not None:
+    RESPONDERS["br"] = BrotliResponder
+if zstandard is not None:
+    RESPONDERS["zstd"] = ZstdResponder
+
+
+def negotiate_encoding(accept_encoding: str, preferred: List[str]) -> Optional[str]:
+    """Pick the first server-preferred encoding the client accepts with a non-zero q-value"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in preferred:
+        if encoding in RESPONDERS and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Starlette GZipMiddleware counterpart with brotli/zstd negotiation (when installed)"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: Optional[int] = None,
+        level: Optional[int] = None,
+        encodings: Optional[List[str]] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = settings.compression_minimum_size if minimum_size is None else minimum_size
+        self.level = settings.compression_level if level is None else level
+        self.encodings = settings.compression_encodings if encodings is None else encodings
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = negotiate_encoding(headers.get("Accept-Encoding", ""), self.encodings)
+        if encoding is None:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        else:
+            responder = RESPONDERS[encoding](self.app, self.minimum_size, self.level)
+
+        await responder(scope, receive, send)
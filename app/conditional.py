@@ -0,0 +1,46 @@
+import hashlib
+from typing import Dict
+
+from fastapi import HTTPException, Request, Response, status
+
+from .config import settings
+from . import regions
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+# Per-route Cache-Control, overridable with CACHE_CONTROL_<ROUTE> (e.g. CACHE_CONTROL_ACTIVITIES_TREE).
+# Private: every route needs X-API-Key, so a shared cache must not answer for it
+CACHE_CONTROL: Dict[str, str] = {
+    "activities_tree": "private, max-age=60",
+    "buildings": "private, max-age=60",
+    "organization": DEFAULT_CACHE_CONTROL,
+}
+
+def cache_control(route: str) -> str:
+    return settings.cache_control.get(route, CACHE_CONTROL.get(route, DEFAULT_CACHE_CONTROL))
+
+def make_etag(*parts) -> str:
+    """Weak ETag of a data version: identity and compressed bodies of it are equivalent, not byte-equal"""
+    return 'W/"' + hashlib.sha1(repr(parts).encode()).hexdigest() + '"'
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison
+    candidates = [_opaque(candidate.strip()) for candidate in if_none_match.split(",")]
+    return "*" in candidates or _opaque(etag) in candidates
+
+def check_not_modified(request: Request, response: Response, route: str, *version_parts) -> None:
+    """Raise 304 if the client already has this version, otherwise tag the outgoing response"""
+    # Normalized, so a missing header and "X-Region: default" share one validator
+    region = regions.from_request(request)
+    etag = make_etag(route, region, *version_parts)
+    # The same URL serves a different directory per region
+    headers = {"ETag": etag, "Cache-Control": cache_control(route), "Vary": "X-Region"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
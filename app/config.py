@@ -0,0 +1,81 @@
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+class Settings:
+    """Process configuration, read once from the environment (and .env)"""
+
+    def __init__(self):
+        self.database_url: Optional[str] = os.getenv("DATABASE_URL")
+        self.api_key: Optional[str] = os.getenv("API_KEY")
+        # Serve read-only from a file written by scripts/build_snapshot.py instead of DATABASE_URL
+        self.snapshot_path: Optional[str] = os.getenv("SNAPSHOT_PATH")
+        self.database_replica_urls: List[str] = [
+            url.strip()
+            for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+            if url.strip()
+        ]
+        self.replica_health_check_seconds: float = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+        self.replica_connect_timeout_seconds: int = int(os.getenv("REPLICA_CONNECT_TIMEOUT_SECONDS", "2"))
+        self.read_your_writes_seconds: int = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+        self.db_echo: bool = _env_bool("DB_ECHO", "true")
+        self.auto_create_tables: bool = _env_bool("AUTO_CREATE_TABLES", "true")
+        self.web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+        self.db_max_connections: Optional[int] = int(os.environ["DB_MAX_CONNECTIONS"]) if os.getenv("DB_MAX_CONNECTIONS") else None
+
+        # Regions selectable with X-Region; empty allows any well-formed region name
+        self.regions: List[str] = [
+            region.strip().lower()
+            for region in os.getenv("REGIONS", "").split(",")
+            if region.strip()
+        ]
+
+        self.search_documents_enabled: bool = _env_bool("SEARCH_DOCUMENTS_ENABLED", "false")
+        self.activity_index_poll_seconds: float = float(os.getenv("ACTIVITY_INDEX_POLL_SECONDS", "30"))
+        self.job_workers: int = int(os.getenv("JOB_WORKERS", "2"))
+        self.job_heartbeat_seconds: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+        self.job_lease_seconds: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+        self.job_max_params_bytes: int = int(os.getenv("JOB_MAX_PARAMS_BYTES", str(8 * 1024 * 1024)))
+        self.building_index_enabled: bool = _env_bool("BUILDING_INDEX_ENABLED", "false")
+        self.building_index_poll_seconds: float = float(os.getenv("BUILDING_INDEX_POLL_SECONDS", "30"))
+        self.suggest_index_poll_seconds: float = float(os.getenv("SUGGEST_INDEX_POLL_SECONDS", "30"))
+
+        self.search_max_radius_km: float = float(os.getenv("SEARCH_MAX_RADIUS_KM", "100"))
+        self.search_max_results: int = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))
+        self.search_min_pattern_length: int = int(os.getenv("SEARCH_MIN_PATTERN_LENGTH", "2"))
+        self.search_statement_timeout_ms: int = int(os.getenv("SEARCH_STATEMENT_TIMEOUT_MS", "5000"))
+        # Planner row estimate limit for searches on PostgreSQL, 0 disables the EXPLAIN check
+        self.search_max_estimated_rows: int = int(os.getenv("SEARCH_MAX_ESTIMATED_ROWS", "0"))
+
+        # Requests carrying X-Profile: <PROFILING_TOKEN>, plus a random share, are profiled
+        self.profiling_token: Optional[str] = os.getenv("PROFILING_TOKEN")
+        self.profiling_sample_rate: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+        self.profiling_interval_ms: float = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+        self.profiling_dir: str = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "profiles"))
+        self.profiling_max_files: int = int(os.getenv("PROFILING_MAX_FILES", "1000"))
+        self.profiling_max_age_seconds: float = float(os.getenv("PROFILING_MAX_AGE_SECONDS", "86400"))
+
+        self.compression_minimum_size: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+        self.compression_level: int = int(os.getenv("COMPRESSION_LEVEL", "6"))
+        self.compression_encodings: List[str] = [
+            encoding.strip()
+            for encoding in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+            if encoding.strip()
+        ]
+
+        # CACHE_CONTROL_<ROUTE>=... overrides, keyed by lower-cased route name
+        self.cache_control: Dict[str, str] = {
+            name[len("CACHE_CONTROL_"):].lower(): value
+            for name, value in os.environ.items()
+            if name.startswith("CACHE_CONTROL_")
+        }
+
+settings = Settings()
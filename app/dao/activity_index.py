@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models, regions
+from ..config import settings
+
+
+class ActivityIndex:
+    """The whole activity hierarchy held in memory: adjacency, subtree id sets and names."""
+
+    def __init__(self, rows, signature=None):
+        self.names: Dict[int, str] = {}
+        self.parents: Dict[int, Optional[int]] = {}
+        self.children: Dict[Optional[int], List[int]] = {}
+        for activity_id, name, parent_id in sorted(rows):
+            self.names[activity_id] = name
+            self.parents[activity_id] = parent_id
+            self.children.setdefault(parent_id, []).append(activity_id)
+
+        self._folded: List[Tuple[str, int]] = [
+            (name.casefold(), activity_id) for activity_id, name in self.names.items()
+        ]
+        self.descendants: Dict[int, FrozenSet[int]] = {}
+        for activity_id in self.names:
+            self._collect(activity_id)
+        self.signature = signature
+
+    def _collect(self, root_id: int) -> FrozenSet[int]:
+        """Fill descendant sets bottom-up without recursion (the hierarchy may be deep)"""
+        stack = [(root_id, False)]
+        while stack:
+            activity_id, expanded = stack.pop()
+            if activity_id in self.descendants:
+                continue
+            children = self.children.get(activity_id, [])
+            if expanded:
+                subtree: Set[int] = {activity_id}
+                for child_id in children:
+                    subtree |= self.descendants.get(child_id, frozenset())
+                self.descendants[activity_id] = frozenset(subtree)
+            else:
+                stack.append((activity_id, True))
+                stack.extend((child_id, False) for child_id in children if child_id not in self.descendants)
+        return self.descendants[root_id]
+
+    @classmethod
+    def load(cls, db: Session):
+        rows = db.query(models.Activity.id, models.Activity.name, models.Activity.parent_id).all()
+        return cls(rows, signature=_signature(db))
+
+    def subtree(self, activity_id: int) -> Set[int]:
+        """Ids of the activity and all its descendants (just the id itself if unknown)"""
+        return set(self.descendants.get(activity_id, (activity_id,)))
+
+    def match(self, name: str) -> List[int]:
+        """Ids whose name contains `name`, case- and Unicode-insensitively"""
+        needle = name.casefold()
+        return [activity_id for folded, activity_id in self._folded if needle in folded]
+
+
+def _signature(db: Session):
+    return tuple(db.query(func.count(models.Activity.id), func.max(models.Activity.updated_at)).one())
+
+
+# Per region: the index, the local version it was built at, and when another worker's writes were last checked
+_indexes: Dict[str, ActivityIndex] = {}
+_index_versions: Dict[str, int] = {}
+_versions: Dict[str, int] = {}
+_checked_at: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def get_index(db: Session) -> ActivityIndex:
+    """Return the region's cached index, rebuilding after a local bump or a change seen from another worker"""
+    region = regions.current(db)
+    index = _indexes.get(region)
+    stale = index is None or _index_versions.get(region) != _versions.get(region, 0)
+
+    if not stale and time.monotonic() - _checked_at.get(region, 0.0) >= settings.activity_index_poll_seconds:
+        _checked_at[region] = time.monotonic()
+        stale = _signature(db) != index.signature
+
+    if stale:
+        version = _versions.get(region, 0)
+        index = ActivityIndex.load(db)
+        with _lock:
+            _indexes[region] = index
+            _index_versions[region] = version
+            _checked_at[region] = time.monotonic()
+    return index
+
+
+def invalidate(db: Session) -> None:
+    region = regions.current(db)
+    with _lock:
+        _versions[region] = _versions.get(region, 0) + 1
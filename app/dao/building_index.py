@@ -0,0 +1,138 @@
+import bisect
+import math
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models, regions
+from ..config import settings
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = (math.sin(delta_lat / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+class BuildingIndex:
+    """Building coordinates sorted by latitude in compact parallel arrays."""
+
+    def __init__(self, rows, signature=None):
+        rows = sorted(rows, key=lambda row: row[1])
+        self.ids = array('q', (row[0] for row in rows))
+        self.latitudes = array('d', (row[1] for row in rows))
+        self.longitudes = array('d', (row[2] for row in rows))
+        self.signature = signature
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, db: Session):
+        rows = db.query(
+            models.Building.id,
+            models.Building.latitude,
+            models.Building.longitude
+        ).all()
+        return cls(rows, signature=_signature(db))
+
+    def _band(self, min_lat: float, max_lat: float) -> range:
+        start = bisect.bisect_left(self.latitudes, min_lat)
+        end = bisect.bisect_right(self.latitudes, max_lat)
+        return range(start, end)
+
+    def _within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[float, int]]:
+        delta = radius_km / KM_PER_DEGREE
+        result = []
+        for i in self._band(latitude - delta, latitude + delta):
+            distance = haversine_distance(latitude, longitude, self.latitudes[i], self.longitudes[i])
+            if distance <= radius_km:
+                result.append((distance, self.ids[i]))
+        return result
+
+    def radius(self, latitude: float, longitude: float, radius_km: float) -> List[int]:
+        return [building_id for _, building_id in self._within(latitude, longitude, radius_km)]
+
+    def rectangle(self, north_east_lat: float, north_east_lon: float,
+                  south_west_lat: float, south_west_lon: float) -> List[int]:
+        return [
+            self.ids[i]
+            for i in self._band(south_west_lat, north_east_lat)
+            if south_west_lon <= self.longitudes[i] <= north_east_lon
+        ]
+
+    def nearest(self, latitude: float, longitude: float, limit: int) -> List[int]:
+        """Building ids ordered by distance, widening the latitude band until `limit` are found."""
+        limit = min(limit, len(self))
+        radius_km = 1.0
+        while True:
+            candidates = self._within(latitude, longitude, radius_km)
+            if len(candidates) >= limit or radius_km >= MAX_DISTANCE_KM:
+                candidates.sort()
+                return [building_id for _, building_id in candidates[:limit]]
+            radius_km = min(radius_km * 4, MAX_DISTANCE_KM)
+
+
+def _signature(db: Session):
+    # updated_at catches coordinates moved by upsert_buildings in another worker
+    return tuple(db.query(
+        func.count(models.Building.id),
+        func.max(models.Building.id),
+        func.max(models.Building.updated_at)
+    ).one())
+
+
+_indexes: Dict[str, BuildingIndex] = {}
+_checked_at: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def warm(db: Session) -> Optional[BuildingIndex]:
+    if not settings.building_index_enabled:
+        return None
+    region = regions.current(db)
+    index = BuildingIndex.load(db)
+    with _lock:
+        _indexes[region] = index
+        _checked_at[region] = time.monotonic()
+    return index
+
+
+def get_index(db: Session) -> BuildingIndex:
+    """Return the region's warm index, reloading it when another worker changed its buildings.
+
+    When the index is disabled a transient one is built from the id/lat/lon columns only.
+    """
+    if not settings.building_index_enabled:
+        return BuildingIndex.load(db)
+
+    region = regions.current(db)
+    index = _indexes.get(region)
+    if index is None:
+        return warm(db)
+
+    if time.monotonic() - _checked_at[region] >= settings.building_index_poll_seconds:
+        _checked_at[region] = time.monotonic()
+        if _signature(db) != index.signature:
+            return warm(db)
+    return index
+
+
+def invalidate(db: Session) -> None:
+    if settings.building_index_enabled:
+        warm(db)
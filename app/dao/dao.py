@@ -1,8 +1,62 @@
 import math
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
-from typing import List, Optional
-from .. import models, schemas
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, case, cast, distinct, func, literal, select, union_all, Integer
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Iterable, Iterator, List, Optional
+from .. import models, query_guard, regions, schemas
+from ..config import settings
+from . import activity_index, building_index, loader, search_documents, suggest_index
+from .building_index import KM_PER_DEGREE, MAX_DISTANCE_KM, haversine_distance
+
+CHANGE_INSERT = "insert"
+CHANGE_UPDATE = "update"
+CHANGE_DELETE = "delete"
+
+# Advisory lock namespace serializing outbox appends per region (the key is the region's hash)
+OUTBOX_LOCK_NAMESPACE = 36
+
+def _lock_outbox(db: Session):
+    """Hold the region's outbox lock until commit, so change ids become visible in commit order.
+
+    Otherwise a transaction allocating a lower id could commit after a feed consumer has already
+    read past it, and the change would be skipped for good. SQLite needs nothing: its single
+    writer already commits in id order.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            select(func.pg_advisory_xact_lock(OUTBOX_LOCK_NAMESPACE, func.hashtext(regions.current(db))))
+        )
+
+def record_change(db: Session, entity: str, entity_id: int, operation: str):
+    """Append to the change outbox; committed together with the caller's transaction"""
+    _lock_outbox(db)
+    db.execute(
+        models.Change.__table__.insert().values(
+            region=regions.current(db),
+            entity=entity,
+            entity_id=entity_id,
+            operation=operation,
+            changed_at=models.utcnow()
+        )
+    )
+    suggest_index.mark_dirty(db, entity, [entity_id])
+
+def record_changes(db: Session, entity: str, rows: List[dict]):
+    if rows:
+        _lock_outbox(db)
+        changed_at = models.utcnow()
+        db.execute(
+            models.Change.__table__.insert(),
+            [{"region": regions.current(db), "entity": entity, "changed_at": changed_at, **row} for row in rows]
+        )
+        suggest_index.mark_dirty(db, entity, [row["entity_id"] for row in rows])
+
+def get_changes(db: Session, since: int = 0, limit: int = 1000):
+    return db.query(models.Change)\
+        .filter(models.Change.id > since)\
+        .order_by(models.Change.id)\
+        .limit(limit)
 
 def get_organization_phones(db: Session, organization_id: int) -> List[str]:
     """Get all phone numbers for an organization"""
@@ -25,9 +79,11 @@ def add_organization_phone(db: Session, organization_id: int, phone_number: str)
         db.execute(
             models.organization_phones.insert().values(
                 organization_id=organization_id,
-                phone_number=phone_number
+                phone_number=phone_number,
+                phone_digits=models.phone_digits(phone_number)
             )
         )
+        record_change(db, "organization", organization_id, CHANGE_UPDATE)
         db.commit()
         return True
     return False
@@ -39,29 +95,169 @@ def remove_organization_phone(db: Session, organization_id: int, phone_number: s
             (models.organization_phones.c.phone_number == phone_number)
         )
     )
+    if result.rowcount > 0:
+        record_change(db, "organization", organization_id, CHANGE_UPDATE)
     db.commit()
     return result.rowcount > 0
 
 def set_organization_phones(db: Session, organization_id: int, phone_numbers: List[str]):
+    """Replace the organization's phones; committed with the caller's transaction"""
     db.execute(
         models.organization_phones.delete().where(
             models.organization_phones.c.organization_id == organization_id
         )
     )
-    
-    for phone in phone_numbers:
+    _insert_phones(db, organization_id, phone_numbers)
+
+def _insert_phones(db: Session, organization_id: int, phone_numbers: List[str]):
+    if phone_numbers:
         db.execute(
-            models.organization_phones.insert().values(
-                organization_id=organization_id,
-                phone_number=phone
+            models.organization_phones.insert(),
+            [
+                {
+                    "organization_id": organization_id,
+                    "phone_number": phone,
+                    "phone_digits": models.phone_digits(phone)
+                }
+                for phone in phone_numbers
+            ]
+        )
+
+def _link_activities(db: Session, region: str, organization_id: int, activity_ids: List[int]):
+    if activity_ids:
+        db.execute(
+            models.organization_activities.insert(),
+            [
+                {"region": region, "organization_id": organization_id, "activity_id": activity_id}
+                for activity_id in activity_ids
+            ]
+        )
+
+def _touch_organization(db: Session, organization_id: int) -> bool:
+    """Bump updated_at (the detail ETag version); False if the organization does not exist"""
+    return db.query(models.Organization)\
+        .filter(models.Organization.id == organization_id)\
+        .update({"updated_at": models.utcnow()}, synchronize_session=False) == 1
+
+def _finish_organization_patch(db: Session, organization_id: int):
+    record_change(db, "organization", organization_id, CHANGE_UPDATE)
+    # Commits the delta, the outbox row and the refreshed search document together
+    search_documents.refresh_document(db, organization_id)
+
+def patch_organization_phones(db: Session, organization_id: int, add: List[str], remove: List[str]):
+    """Apply only the given phone additions/removals in one transaction; returns the resulting numbers"""
+    if not _touch_organization(db, organization_id):
+        db.rollback()
+        return None
+
+    phones = models.organization_phones
+    if remove:
+        db.execute(phones.delete().where(
+            (phones.c.organization_id == organization_id) & phones.c.phone_number.in_(remove)
+        ))
+
+    if add:
+        existing = {
+            row.phone_number for row in db.execute(
+                select(phones.c.phone_number)
+                .where((phones.c.organization_id == organization_id) & phones.c.phone_number.in_(add))
             )
+        }
+        # dict.fromkeys keeps the requested order while dropping repeats
+        new_numbers = [phone for phone in dict.fromkeys(add) if phone not in existing]
+        if new_numbers:
+            db.execute(phones.insert(), [
+                {"organization_id": organization_id, "phone_number": phone, "phone_digits": models.phone_digits(phone)}
+                for phone in new_numbers
+            ])
+
+    phone_numbers = [
+        row.phone_number for row in db.execute(
+            select(phones.c.phone_number)
+            .where(phones.c.organization_id == organization_id)
+            .order_by(phones.c.id)
         )
-    db.commit()
+    ]
+    _finish_organization_patch(db, organization_id)
+    return schemas.OrganizationPhones(organization_id=organization_id, phone_numbers=phone_numbers)
+
+def patch_organization_activities(db: Session, organization_id: int, add: List[int], remove: List[int]):
+    """Apply only the given activity link additions/removals in one transaction; returns the linked ids.
+
+    Raises ValueError for activity ids in `add` that are unknown in the session region.
+    """
+    check_references(db, activity_ids=add)
+    if not _touch_organization(db, organization_id):
+        db.rollback()
+        return None
+
+    links = models.organization_activities
+    if remove:
+        db.execute(links.delete().where(
+            (links.c.organization_id == organization_id) & links.c.activity_id.in_(remove)
+        ))
+
+    if add:
+        existing = {
+            row.activity_id for row in db.execute(
+                select(links.c.activity_id)
+                .where((links.c.organization_id == organization_id) & links.c.activity_id.in_(add))
+            )
+        }
+        new_ids = [activity_id for activity_id in dict.fromkeys(add) if activity_id not in existing]
+        if new_ids:
+            region = regions.current(db)
+            db.execute(links.insert(), [
+                {"region": region, "organization_id": organization_id, "activity_id": activity_id}
+                for activity_id in new_ids
+            ])
+
+    activity_ids = [
+        row.activity_id for row in db.execute(
+            select(links.c.activity_id)
+            .where(links.c.organization_id == organization_id)
+            .order_by(links.c.activity_id)
+        )
+    ]
+    _finish_organization_patch(db, organization_id)
+    return schemas.OrganizationActivities(organization_id=organization_id, activity_ids=activity_ids)
+
+def check_references(db: Session, building_ids: Iterable[int] = (), activity_ids: Iterable[int] = ()):
+    """Raise ValueError for building or activity ids that do not exist in the session region"""
+    building_ids = set(building_ids)
+    if building_ids:
+        found = {row.id for row in db.query(models.Building.id).filter(models.Building.id.in_(building_ids))}
+        if building_ids - found:
+            raise ValueError(f"Unknown building ids: {sorted(building_ids - found)}")
+    unknown = set(activity_ids) - activity_index.get_index(db).names.keys()
+    if unknown:
+        raise ValueError(f"Unknown activity ids: {sorted(unknown)}")
 
-def _add_phone_numbers_to_organizations(db: Session, organizations: List[models.Organization]):
-    for org in organizations:
-        org._phone_numbers = get_organization_phones(db, org.id)
-    return organizations
+def _insert(db: Session, table):
+    """Dialect INSERT construct supporting ON CONFLICT (PostgreSQL and SQLite)"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+def _organization_query(db: Session):
+    # Relations are attached by the request loader; any lazy load is a bug
+    return db.query(models.Organization).options(raiseload('*'))
+
+def _fetch_page(db: Session, query, skip: int, limit: int):
+    """One page of a search, in organization id order"""
+    query = query.order_by(models.Organization.id).offset(skip).limit(limit)
+    query_guard.check_estimate(db, query)
+    return query.all()
+
+def _with_activities(activity_ids):
+    """Organizations linked to any of `activity_ids`, each once however many of them it has"""
+    return models.Organization.id.in_(
+        select(models.organization_activities.c.organization_id)
+        .where(models.organization_activities.c.activity_id.in_(activity_ids))
+    )
+
+def _hydrate_organizations(db: Session, organizations: List[models.Organization]):
+    return loader.get_loader(db).hydrate_organizations(organizations)
 
 def get_building(db: Session, building_id: int):
     return db.query(models.Building).filter(models.Building.id == building_id).first()
@@ -69,6 +265,9 @@ def get_building(db: Session, building_id: int):
 def get_buildings(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Building).offset(skip).limit(limit).all()
 
+def get_buildings_version(db: Session):
+    return tuple(db.query(func.count(models.Building.id), func.max(models.Building.updated_at)).one())
+
 def create_building(db: Session, building: schemas.BuildingCreate):
     db_building = models.Building(
         address=building.address,
@@ -76,46 +275,141 @@ def create_building(db: Session, building: schemas.BuildingCreate):
         longitude=building.longitude
     )
     db.add(db_building)
+    db.flush()
+    record_change(db, "building", db_building.id, CHANGE_INSERT)
     db.commit()
     db.refresh(db_building)
+    building_index.invalidate(db)
     return db_building
 
+def upsert_buildings(db: Session, buildings: List[schemas.BuildingCreate]):
+    """Insert or update buildings keyed by (region, address) in a single statement"""
+    region = regions.current(db)
+    rows = {building.address: {"region": region, **building.model_dump()} for building in buildings}
+    if not rows:
+        return []
+
+    existing = {
+        row.address for row in db.query(models.Building.address)
+        .filter(models.Building.address.in_(list(rows)))
+    }
+    statement = _insert(db, models.Building.__table__).values(list(rows.values()))
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.Building.region, models.Building.address],
+        set_={
+            "latitude": statement.excluded.latitude,
+            "longitude": statement.excluded.longitude,
+            "updated_at": models.utcnow(),
+        }
+    ).returning(
+        models.Building.id,
+        models.Building.address,
+        models.Building.latitude,
+        models.Building.longitude
+    )
+    result = db.execute(statement).mappings().all()
+    record_changes(db, "building", [
+        {
+            "entity_id": row["id"],
+            "operation": CHANGE_UPDATE if row["address"] in existing else CHANGE_INSERT
+        }
+        for row in result
+    ])
+    db.commit()
+    building_index.invalidate(db)
+
+    # Organization documents embed the building address and coordinates
+    organization_ids = [
+        row.id for row in db.query(models.Organization.id)
+        .filter(models.Organization.building_id.in_([building["id"] for building in result]))
+    ]
+    if organization_ids:
+        search_documents.refresh_documents(db, organization_ids)
+    return result
+
+def delete_building(db: Session, building_id: int, batch_size: int = 1000, on_batch=None):
+    """Delete a building and its organizations in id batches without loading them.
+
+    `on_batch` is called with (deleted, total) after each committed batch.
+    """
+    if db.query(models.Building.id).filter(models.Building.id == building_id).first() is None:
+        return None
+
+    total = db.query(func.count(models.Organization.id))\
+        .filter(models.Organization.building_id == building_id)\
+        .scalar()
+    deleted = 0
+    while True:
+        batch = select(models.Organization.id)\
+            .where(models.Organization.building_id == building_id)\
+            .order_by(models.Organization.id)\
+            .limit(batch_size)\
+            .scalar_subquery()
+        organization_ids = _delete_organizations_where(db, models.Organization.id.in_(batch))
+        if not organization_ids:
+            break
+        db.commit()
+
+        deleted += len(organization_ids)
+        if on_batch is not None:
+            on_batch(deleted, total)
+
+    db.query(models.Building).filter(models.Building.id == building_id).delete(synchronize_session=False)
+    record_change(db, "building", building_id, CHANGE_DELETE)
+    db.commit()
+    building_index.invalidate(db)
+    return deleted
+
 def get_activity(db: Session, activity_id: int):
-    return db.query(models.Activity).filter(models.Activity.id == activity_id).first()
+    activity = db.query(models.Activity)\
+        .options(raiseload('*'))\
+        .filter(models.Activity.id == activity_id)\
+        .first()
+    if activity:
+        loader.get_loader(db).hydrate_activities([activity])
+    return activity
 
 def get_activities(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Activity).offset(skip).limit(limit).all()
+    activities = db.query(models.Activity)\
+        .options(raiseload('*'))\
+        .offset(skip).limit(limit).all()
+    return loader.get_loader(db).hydrate_activities(activities)
+
+def get_activities_version(db: Session):
+    return tuple(db.query(func.count(models.Activity.id), func.max(models.Activity.updated_at)).one())
 
 def create_activity(db: Session, activity: schemas.ActivityCreate):
+    if activity.parent_id is not None:
+        check_references(db, activity_ids=[activity.parent_id])
     db_activity = models.Activity(
         name=activity.name,
         parent_id=activity.parent_id
     )
     db.add(db_activity)
+    db.flush()
+    record_change(db, "activity", db_activity.id, CHANGE_INSERT)
     db.commit()
     db.refresh(db_activity)
+    activity_index.invalidate(db)
+    # A new activity has no children yet; don't let serialization lazy load them
+    set_committed_value(db_activity, 'children', [])
     return db_activity
 
 def get_activities_tree(db: Session, max_level: int = 3):
+    index = activity_index.get_index(db)
+
     def build_tree(parent_id=None, level=0):
         if level >= max_level:
             return []
         
-        query = db.query(models.Activity)
-        if parent_id is None:
-            query = query.filter(models.Activity.parent_id.is_(None))
-        else:
-            query = query.filter(models.Activity.parent_id == parent_id)
-        
-        activities = query.all()
         result = []
-        for activity in activities:
+        for activity_id in index.children.get(parent_id, []):
             activity_data = schemas.ActivityWithLevel(
-                id=activity.id,
-                name=activity.name,
-                parent_id=activity.parent_id,
+                id=activity_id,
+                name=index.names[activity_id],
+                parent_id=parent_id,
                 level=level,
-                children=build_tree(activity.id, level + 1)
+                children=build_tree(activity_id, level + 1)
             )
             result.append(activity_data)
         return result
@@ -123,77 +417,169 @@ def get_activities_tree(db: Session, max_level: int = 3):
     return build_tree()
 
 def get_activity_descendants(db: Session, activity_id: int):
-    def get_descendants_ids(parent_id, descendants=None):
-        if descendants is None:
-            descendants = set()
-        
-        activities = db.query(models.Activity).filter(models.Activity.parent_id == parent_id).all()
-        for activity in activities:
-            descendants.add(activity.id)
-            get_descendants_ids(activity.id, descendants)
-        
-        return descendants
-    
-    descendants = get_descendants_ids(activity_id)
-    descendants.add(activity_id) 
-    return descendants
+    return activity_index.get_index(db).subtree(activity_id)
+
+def match_activity_ids(db: Session, activity_name: str) -> List[int]:
+    """Ids of activities whose name contains `activity_name` (case-insensitive)"""
+    return activity_index.get_index(db).match(activity_name)
 
 def get_organization(db: Session, organization_id: int):
-    organization = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
+    organization = _organization_query(db)\
         .filter(models.Organization.id == organization_id)\
         .first()
     
     if organization:
-        organization._phone_numbers = get_organization_phones(db, organization_id)
+        _hydrate_organizations(db, [organization])
     
     return organization
 
+def get_organization_version(db: Session, organization_id: int):
+    """Change stamp of an organization and the building/activities embedded in it, None if missing"""
+    row = db.query(
+        models.Organization.updated_at,
+        models.Building.updated_at,
+        func.max(models.Activity.updated_at)
+    )\
+        .join(models.Building, models.Organization.building_id == models.Building.id)\
+        .outerjoin(models.organization_activities, models.organization_activities.c.organization_id == models.Organization.id)\
+        .outerjoin(models.Activity, models.organization_activities.c.activity_id == models.Activity.id)\
+        .filter(models.Organization.id == organization_id)\
+        .group_by(models.Organization.id, models.Organization.updated_at, models.Building.updated_at)\
+        .first()
+    return tuple(row) if row else None
+
 def get_organizations(db: Session, skip: int = 0, limit: int = 100):
-    organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
+    if settings.search_documents_enabled:
+        return search_documents.search(db, skip=skip, limit=limit)
+
+    organizations = _organization_query(db)\
         .offset(skip).limit(limit).all()
     
-    return _add_phone_numbers_to_organizations(db, organizations)
+    return _hydrate_organizations(db, organizations)
 
 def create_organization(db: Session, organization: schemas.OrganizationCreate):
+    """Raises ValueError for a building or activities of another region"""
+    check_references(db, [organization.building_id], organization.activity_ids)
     db_organization = models.Organization(
         name=organization.name,
         building_id=organization.building_id
     )
     db.add(db_organization)
+    db.flush()
+    organization_id = db_organization.id
+
+    # The row, its phones and links and the change entry are committed together, so a feed
+    # consumer never sees the organization without them
+    _insert_phones(db, organization_id, organization.phone_numbers)
+    _link_activities(db, db_organization.region, organization_id, organization.activity_ids)
+    record_change(db, "organization", organization_id, CHANGE_INSERT)
     db.commit()
-    db.refresh(db_organization)
 
-    if organization.phone_numbers:
-        set_organization_phones(db, db_organization.id, organization.phone_numbers)
-    
-    if organization.activity_ids:
-        for activity_id in organization.activity_ids:
-            db.execute(
-                models.organization_activities.insert().values(
-                    organization_id=db_organization.id,
-                    activity_id=activity_id
-                )
-            )
-        db.commit()
+    search_documents.refresh_document(db, organization_id)
+    return get_organization(db, organization_id)
 
-    db_organization = get_organization(db, db_organization.id)
-    return db_organization
+def upsert_organizations(db: Session, organizations: List[schemas.OrganizationUpsert]):
+    """Insert or update organizations keyed by (region, external_id), replacing their phones and activities.
+
+    Runs as one upsert plus set-based delete/insert statements for the links. Raises ValueError
+    for buildings or activities of another region.
+    """
+    records = {organization.external_id: organization for organization in organizations}
+    if not records:
+        return []
+    check_references(
+        db,
+        (organization.building_id for organization in records.values()),
+        (activity_id for organization in records.values() for activity_id in organization.activity_ids)
+    )
+
+    existing = {
+        row.external_id for row in db.query(models.Organization.external_id)
+        .filter(models.Organization.external_id.in_(list(records)))
+    }
+    region = regions.current(db)
+    statement = _insert(db, models.Organization.__table__).values([
+        {
+            "region": region,
+            "external_id": external_id,
+            "name": organization.name,
+            "building_id": organization.building_id,
+            "updated_at": models.utcnow(),
+        }
+        for external_id, organization in records.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.Organization.region, models.Organization.external_id],
+        set_={
+            "name": statement.excluded.name,
+            "building_id": statement.excluded.building_id,
+            "updated_at": statement.excluded.updated_at,
+        }
+    ).returning(models.Organization.id, models.Organization.external_id)
+    result = db.execute(statement).mappings().all()
+    ids = {row["external_id"]: row["id"] for row in result}
+    organization_ids = list(ids.values())
+
+    db.execute(
+        models.organization_phones.delete().where(
+            models.organization_phones.c.organization_id.in_(organization_ids)
+        )
+    )
+    db.execute(
+        models.organization_activities.delete().where(
+            models.organization_activities.c.organization_id.in_(organization_ids)
+        )
+    )
+
+    phones = [
+        {
+            "organization_id": ids[external_id],
+            "phone_number": phone,
+            "phone_digits": models.phone_digits(phone)
+        }
+        for external_id, organization in records.items()
+        for phone in organization.phone_numbers
+    ]
+    if phones:
+        db.execute(models.organization_phones.insert(), phones)
+
+    activity_links = [
+        {"region": region, "organization_id": ids[external_id], "activity_id": activity_id}
+        for external_id, organization in records.items()
+        for activity_id in organization.activity_ids
+    ]
+    if activity_links:
+        db.execute(models.organization_activities.insert(), activity_links)
+
+    record_changes(db, "organization", [
+        {
+            "entity_id": organization_id,
+            "operation": CHANGE_UPDATE if external_id in existing else CHANGE_INSERT
+        }
+        for external_id, organization_id in ids.items()
+    ])
+    db.commit()
+    search_documents.refresh_documents(db, organization_ids)
+    return result
 
 def update_organization(db: Session, organization_id: int, organization_update: schemas.OrganizationUpdate):
-    db_organization = get_organization(db, organization_id)
+    """Raises ValueError for a building or activities of another region"""
+    update_data = organization_update.model_dump(exclude_unset=True)
+    check_references(
+        db,
+        [update_data['building_id']] if update_data.get('building_id') is not None else [],
+        update_data.get('activity_ids') or []
+    )
+
+    db_organization = _organization_query(db).filter(models.Organization.id == organization_id).first()
     if not db_organization:
         return None
-    
-    update_data = organization_update.model_dump(exclude_unset=True)
 
     if 'name' in update_data:
         db_organization.name = update_data['name']
     if 'building_id' in update_data:
         db_organization.building_id = update_data['building_id']
+    db_organization.updated_at = models.utcnow()
     
     if 'phone_numbers' in update_data:
         set_organization_phones(db, organization_id, update_data['phone_numbers'])
@@ -204,135 +590,340 @@ def update_organization(db: Session, organization_id: int, organization_update:
                 models.organization_activities.c.organization_id == organization_id
             )
         )
-        for activity_id in update_data['activity_ids']:
-            db.execute(
-                models.organization_activities.insert().values(
-                    organization_id=organization_id,
-                    activity_id=activity_id
-                )
-            )
+        _link_activities(db, db_organization.region, organization_id, update_data['activity_ids'])
     
+    # One transaction: a failure anywhere leaves the organization as it was
+    db.flush()
+    record_change(db, "organization", organization_id, CHANGE_UPDATE)
     db.commit()
-    db.refresh(db_organization)
+    search_documents.refresh_document(db, organization_id)
 
     return get_organization(db, organization_id)
 
+def _delete_organizations_where(db: Session, condition) -> List[int]:
+    """DELETE ... RETURNING id; phones, activity links and search documents go with ON DELETE CASCADE"""
+    organizations = models.Organization.__table__
+    condition = and_(organizations.c.region == regions.current(db), condition)
+    deleted = [
+        row.id for row in db.execute(organizations.delete().where(condition).returning(organizations.c.id))
+    ]
+    record_changes(db, "organization", [
+        {"entity_id": organization_id, "operation": CHANGE_DELETE}
+        for organization_id in deleted
+    ])
+    return deleted
+
+def delete_organizations(db: Session, organization_ids: List[int]) -> List[int]:
+    """Delete organizations by id in one statement; returns the ids that existed"""
+    if not organization_ids:
+        return []
+    deleted = _delete_organizations_where(db, models.Organization.id.in_(organization_ids))
+    db.commit()
+    return deleted
+
+def delete_organizations_by_building(db: Session, building_id: int) -> List[int]:
+    deleted = _delete_organizations_where(db, models.Organization.building_id == building_id)
+    db.commit()
+    return deleted
+
 def delete_organization(db: Session, organization_id: int):
-    """Delete organization and all related phone numbers"""
-    db_organization = get_organization(db, organization_id)
-    if db_organization:
-        db.execute(
-            models.organization_phones.delete().where(
-                models.organization_phones.c.organization_id == organization_id
-            )
-        )
-        
-        # db.execute(
-        #     models.organization_activities.delete().where(
-        #         models.organization_activities.c.organization_id == organization_id
-        #     )
-        # )
-        
-        db.delete(db_organization)
-        db.commit()
-        return True
-    return False
+    return bool(delete_organizations(db, [organization_id]))
 
-def get_organizations_by_building(db: Session, building_id: int):
-    organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
-        .filter(models.Organization.building_id == building_id)\
-        .all()
+def get_organizations_by_building(db: Session, building_id: int, skip: int = 0, limit: int = 100):
+    if settings.search_documents_enabled:
+        return search_documents.search(db, building_id=building_id, skip=skip, limit=limit)
+
+    organizations = _organization_query(db)\
+        .filter(models.Organization.building_id == building_id)
+    organizations = _fetch_page(db, organizations, skip, limit)
     
-    return _add_phone_numbers_to_organizations(db, organizations)
+    return _hydrate_organizations(db, organizations)
+
+def get_organizations_by_activity(db: Session, activity_id: int, skip: int = 0, limit: int = 100):
+    if settings.search_documents_enabled:
+        return search_documents.search(db, activity_filters=[[activity_id]], skip=skip, limit=limit)
 
-def get_organizations_by_activity(db: Session, activity_id: int):
     activity_descendants = get_activity_descendants(db, activity_id)
     
-    organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
-        .join(models.organization_activities)\
-        .filter(models.organization_activities.c.activity_id.in_(activity_descendants))\
-        .all()
+    organizations = _organization_query(db)\
+        .filter(_with_activities(activity_descendants))
+    organizations = _fetch_page(db, organizations, skip, limit)
     
-    return _add_phone_numbers_to_organizations(db, organizations)
+    return _hydrate_organizations(db, organizations)
 
-def search_organizations_by_name(db: Session, name: str):
-    organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
-        .filter(models.Organization.name.ilike(f"%{name}%"))\
-        .all()
+def search_organizations_by_name(db: Session, name: str, skip: int = 0, limit: int = 100):
+    if settings.search_documents_enabled:
+        return search_documents.search(db, name=name, skip=skip, limit=limit)
+
+    organizations = _organization_query(db)\
+        .filter(models.Organization.name.ilike(f"%{name}%"))
+    organizations = _fetch_page(db, organizations, skip, limit)
     
-    return _add_phone_numbers_to_organizations(db, organizations)
+    return _hydrate_organizations(db, organizations)
 
-def search_organizations_by_activity_tree(db: Session, activity_name: str):
-    matching_activities = db.query(models.Activity)\
-        .filter(models.Activity.name.ilike(f"%{activity_name}%"))\
-        .all()
+def search_organizations_by_activity_tree(db: Session, activity_name: str, skip: int = 0, limit: int = 100):
+    matching_ids = match_activity_ids(db, activity_name)
     
-    if not matching_activities:
+    if not matching_ids:
         return []
     
+    if settings.search_documents_enabled:
+        return search_documents.search(db, activity_filters=[matching_ids], skip=skip, limit=limit)
+
     all_activity_ids = set()
-    for activity in matching_activities:
-        descendants = get_activity_descendants(db, activity.id)
-        all_activity_ids.update(descendants)
+    for activity_id in matching_ids:
+        all_activity_ids.update(get_activity_descendants(db, activity_id))
     
-    organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
-        .join(models.organization_activities)\
-        .filter(models.organization_activities.c.activity_id.in_(all_activity_ids))\
-        .all()
+    organizations = _organization_query(db)\
+        .filter(_with_activities(all_activity_ids))
+    organizations = _fetch_page(db, organizations, skip, limit)
     
-    return _add_phone_numbers_to_organizations(db, organizations)
+    return _hydrate_organizations(db, organizations)
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = (math.sin(delta_lat / 2) ** 2 + 
-         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
+def _get_organizations_by_building_ids(db: Session, building_ids: List[int], skip: int, limit: int):
+    if not building_ids:
+        return []
 
-def get_organizations_in_radius(db: Session, center: schemas.Coordinate, radius_km: float):
-    all_organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
-        .all()
-    
+    organizations = _fetch_page(db, _organization_query(db)
+                                .filter(models.Organization.building_id.in_(building_ids)), skip, limit)
+
+    return _hydrate_organizations(db, organizations)
+
+def _near_buildings(center: schemas.Coordinate, radius_km: float):
+    """Condition keeping every building within `radius_km` of `center` (and a few just outside)"""
+    # Only buildings inside the bounding box of the circle can be within the radius
+    delta_lat = radius_km / KM_PER_DEGREE
+    delta_lon = delta_lat / max(math.cos(math.radians(center.latitude)), 0.01)
+    # A planar distance test, scaled by the smallest cosine in the band and widened by 1%, never
+    # drops a point haversine keeps, so a row limit can be applied in SQL
+    scale = max(math.cos(math.radians(min(abs(center.latitude) + delta_lat, 90))), 0.01)
+    north = models.Building.latitude - center.latitude
+    east = (models.Building.longitude - center.longitude) * scale
+    return and_(
+        models.Building.latitude.between(center.latitude - delta_lat, center.latitude + delta_lat),
+        models.Building.longitude.between(center.longitude - delta_lon, center.longitude + delta_lon),
+        north * north + east * east <= (delta_lat * 1.01) ** 2
+    )
+
+def get_organizations_in_radius(
+    db: Session, center: schemas.Coordinate, radius_km: float, skip: int = 0, limit: int = 100
+):
+    if settings.building_index_enabled:
+        building_ids = building_index.get_index(db).radius(center.latitude, center.longitude, radius_km)
+        return _get_organizations_by_building_ids(db, building_ids, skip, limit)
+
+    candidates = _organization_query(db)\
+        .join(models.Building)\
+        .filter(_near_buildings(center, radius_km))\
+        .add_columns(models.Building.latitude, models.Building.longitude)\
+        .order_by(models.Organization.id)
+    query_guard.check_estimate(db, candidates.limit(skip + limit))
+
+    # The SQL test keeps a few organizations just outside the circle, so the page is cut after
+    # haversine; candidates are read in id-keyed batches until it is full
     organizations_in_radius = []
-    for org in all_organizations:
-        distance = haversine_distance(
-            center.latitude, center.longitude,
-            org.building.latitude, org.building.longitude
-        )
-        if distance <= radius_km:
-            organizations_in_radius.append(org)
+    skipped = 0
+    last_id = 0
+    while len(organizations_in_radius) < limit:
+        batch = candidates.filter(models.Organization.id > last_id).limit(skip + limit).all()
+        for org, latitude, longitude in batch:
+            distance = haversine_distance(
+                center.latitude, center.longitude,
+                latitude, longitude
+            )
+            if distance > radius_km:
+                continue
+            if skipped < skip:
+                skipped += 1
+            elif len(organizations_in_radius) < limit:
+                organizations_in_radius.append(org)
+        if len(batch) < skip + limit:
+            break
+        last_id = batch[-1][0].id
     
-    return _add_phone_numbers_to_organizations(db, organizations_in_radius)
+    return _hydrate_organizations(db, organizations_in_radius)
+
+def get_organizations_in_rectangle(
+    db: Session, north_east: schemas.Coordinate, south_west: schemas.Coordinate, skip: int = 0, limit: int = 100
+):
+    if settings.building_index_enabled:
+        building_ids = building_index.get_index(db).rectangle(
+            north_east.latitude, north_east.longitude,
+            south_west.latitude, south_west.longitude
+        )
+        return _get_organizations_by_building_ids(db, building_ids, skip, limit)
 
-def get_organizations_in_rectangle(db: Session, north_east: schemas.Coordinate, south_west: schemas.Coordinate):
-    organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
+    organizations = _organization_query(db)\
         .join(models.Building)\
         .filter(and_(
             models.Building.latitude.between(south_west.latitude, north_east.latitude),
             models.Building.longitude.between(south_west.longitude, north_east.longitude)
+        ))
+    organizations = _fetch_page(db, organizations, skip, limit)
+    
+    return _hydrate_organizations(db, organizations)
+
+def _nearest_building_ids(db: Session, center: schemas.Coordinate, limit: int) -> List[int]:
+    """BuildingIndex.nearest() in SQL, for when the index is disabled: widen the radius until `limit` are found"""
+    radius_km = 1.0
+    while True:
+        candidates = sorted(
+            (haversine_distance(center.latitude, center.longitude, latitude, longitude), building_id)
+            for building_id, latitude, longitude in db.query(
+                models.Building.id, models.Building.latitude, models.Building.longitude
+            ).filter(_near_buildings(center, radius_km))
+        )
+        candidates = [candidate for candidate in candidates if candidate[0] <= radius_km]
+        if len(candidates) >= limit or radius_km >= MAX_DISTANCE_KM:
+            return [building_id for _, building_id in candidates[:limit]]
+        radius_km = min(radius_km * 4, MAX_DISTANCE_KM)
+
+def get_nearest_organizations(db: Session, center: schemas.Coordinate, limit: int = 10):
+    """The `limit` organizations nearest to `center`, ordered by distance.
+
+    Buildings are taken nearest first in growing batches until they hold `limit` organizations,
+    so buildings without any don't shorten the result.
+    """
+    if settings.building_index_enabled:
+        index = building_index.get_index(db)
+        nearest_buildings = lambda count: index.nearest(center.latitude, center.longitude, count)
+    else:
+        nearest_buildings = lambda count: _nearest_building_ids(db, center, count)
+
+    organizations = []
+    seen = 0
+    count = limit
+    while len(organizations) < limit:
+        batch = nearest_buildings(count)[seen:]
+        if not batch:
+            break
+        rank = case({building_id: position for position, building_id in enumerate(batch)},
+                    value=models.Organization.building_id)
+        organizations.extend(
+            _organization_query(db)
+            .filter(models.Organization.building_id.in_(batch))
+            .order_by(rank, models.Organization.id)
+            .limit(limit - len(organizations))
+            .all()
+        )
+        seen += len(batch)
+        count *= 4
+    return _hydrate_organizations(db, organizations)
+
+def _activity_closure(db: Session):
+    """(ancestor_id, activity_id) pairs for every activity of the region and each of its descendants, itself included"""
+    activities = models.Activity.__table__
+    in_region = activities.c.region == regions.current(db)
+    closure = select(activities.c.id.label("ancestor_id"), activities.c.id.label("activity_id"))\
+        .where(in_region)\
+        .cte("activity_closure", recursive=True)
+    return closure.union_all(
+        select(closure.c.ancestor_id, activities.c.id)
+        .where(in_region & (activities.c.parent_id == closure.c.activity_id))
+    )
+
+def count_organizations_by_activity(db: Session) -> List[schemas.ActivityCount]:
+    """Organizations per activity: direct links and distinct totals over each activity's subtree"""
+    links = models.organization_activities
+    closure = _activity_closure(db)
+    # Joining the (region scoped) organizations keeps other regions' links out of the counts
+    in_region = (models.Organization, models.Organization.id == links.c.organization_id)
+
+    direct = dict(db.execute(
+        select(links.c.activity_id, func.count(distinct(links.c.organization_id)))
+        .join(*in_region)
+        .group_by(links.c.activity_id)
+    ).all())
+    total = dict(db.execute(
+        select(closure.c.ancestor_id, func.count(distinct(links.c.organization_id)))
+        .join(links, links.c.activity_id == closure.c.activity_id)
+        .join(*in_region)
+        .group_by(closure.c.ancestor_id)
+    ).all())
+
+    index = activity_index.get_index(db)
+    return [
+        schemas.ActivityCount(
+            activity_id=activity_id,
+            name=index.names[activity_id],
+            parent_id=index.parents[activity_id],
+            direct_count=direct.get(activity_id, 0),
+            total_count=total.get(activity_id, 0),
+        )
+        for activity_id in sorted(index.names)
+    ]
+
+def count_organizations_by_building(db: Session, skip: int = 0, limit: int = 100) -> List[schemas.BuildingCount]:
+    rows = db.query(
+        models.Building.id,
+        models.Building.address,
+        models.Building.latitude,
+        models.Building.longitude,
+        func.count(models.Organization.id)
+    )\
+        .outerjoin(models.Organization, models.Organization.building_id == models.Building.id)\
+        .group_by(models.Building.id)\
+        .order_by(models.Building.id)\
+        .offset(skip).limit(limit)\
+        .all()
+
+    return [
+        schemas.BuildingCount(
+            building_id=building_id,
+            address=address,
+            latitude=latitude,
+            longitude=longitude,
+            organization_count=count,
+        )
+        for building_id, address, latitude, longitude, count in rows
+    ]
+
+def _grid_cell(db: Session, column, start: float, step: float, cells: int):
+    offset = (column - start) / step
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite casts by truncation, which is floor for the non-negative offsets the rectangle
+        # filter leaves (and floor() needs the optional math functions there)
+        position = cast(offset, Integer)
+    else:
+        # PostgreSQL casts by rounding, which would move points past a cell's middle into the next one
+        position = cast(func.floor(offset), Integer)
+    # Points on the far edge belong to the last cell
+    return case((position >= cells, cells - 1), else_=position)
+
+def count_organizations_in_grid(db: Session, grid: schemas.GridStatsRequest) -> List[schemas.GridCellCount]:
+    """Split the rectangle into rows x columns cells and count organizations in the non-empty ones"""
+    south, west = grid.south_west.latitude, grid.south_west.longitude
+    height = (grid.north_east.latitude - south) / grid.rows
+    width = (grid.north_east.longitude - west) / grid.columns
+    if height <= 0 or width <= 0:
+        return []
+
+    row = _grid_cell(db, models.Building.latitude, south, height, grid.rows).label("row")
+    column = _grid_cell(db, models.Building.longitude, west, width, grid.columns).label("column")
+    rows = db.query(row, column, func.count(models.Organization.id))\
+        .select_from(models.Organization)\
+        .join(models.Building)\
+        .filter(and_(
+            models.Building.latitude.between(south, grid.north_east.latitude),
+            models.Building.longitude.between(west, grid.north_east.longitude)
         ))\
+        .group_by(row, column)\
+        .order_by(row, column)\
         .all()
-    
-    return _add_phone_numbers_to_organizations(db, organizations)
+
+    return [
+        schemas.GridCellCount(
+            row=cell_row,
+            column=cell_column,
+            south_west=schemas.Coordinate(latitude=south + cell_row * height, longitude=west + cell_column * width),
+            north_east=schemas.Coordinate(
+                latitude=south + (cell_row + 1) * height,
+                longitude=west + (cell_column + 1) * width
+            ),
+            organization_count=count,
+        )
+        for cell_row, cell_column, count in rows
+    ]
 
 def search_organizations_comprehensive(
     db: Session,
@@ -343,10 +934,35 @@ def search_organizations_comprehensive(
     skip: int = 0,
     limit: int = 100
 ):
+    if settings.search_documents_enabled:
+        activity_filters = []
+        if activity_id:
+            activity_filters.append([activity_id])
+        if activity_name:
+            matching_ids = match_activity_ids(db, activity_name)
+            if matching_ids:
+                activity_filters.append(matching_ids)
+        return search_documents.search(
+            db,
+            name=name,
+            building_id=building_id,
+            activity_filters=activity_filters,
+            skip=skip,
+            limit=limit
+        )
+
+    query = _comprehensive_query(db, name, building_id, activity_id, activity_name)
+    organizations = _fetch_page(db, query, skip, limit)
+    return _hydrate_organizations(db, organizations)
 
-    query = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))
+def _comprehensive_query(
+    db: Session,
+    name: Optional[str],
+    building_id: Optional[int],
+    activity_id: Optional[int],
+    activity_name: Optional[str]
+):
+    query = _organization_query(db)
     
     if name:
         query = query.filter(models.Organization.name.ilike(f"%{name}%"))
@@ -354,42 +970,277 @@ def search_organizations_comprehensive(
     if building_id:
         query = query.filter(models.Organization.building_id == building_id)
     
+    # Activity filters are subqueries rather than joins, so an organization matching several
+    # activities is still one row of the page
     if activity_id:
         activity_descendants = get_activity_descendants(db, activity_id)
-        query = query.join(models.organization_activities)\
-            .filter(models.organization_activities.c.activity_id.in_(activity_descendants))
+        query = query.filter(_with_activities(activity_descendants))
     
     if activity_name:
-        matching_activities = db.query(models.Activity)\
-            .filter(models.Activity.name.ilike(f"%{activity_name}%"))\
-            .all()
-        if matching_activities:
+        matching_ids = match_activity_ids(db, activity_name)
+        if matching_ids:
             all_activity_ids = set()
-            for activity in matching_activities:
-                descendants = get_activity_descendants(db, activity.id)
-                all_activity_ids.update(descendants)
-            query = query.join(models.organization_activities)\
-                .filter(models.organization_activities.c.activity_id.in_(all_activity_ids))
+            for matching_id in matching_ids:
+                all_activity_ids.update(get_activity_descendants(db, matching_id))
+            query = query.filter(_with_activities(all_activity_ids))
     
-    organizations = query.offset(skip).limit(limit).all()
-    return _add_phone_numbers_to_organizations(db, organizations)
+    return query
 
-def get_organizations_with_phones_by_pattern(db: Session, phone_pattern: str):
-    phone_matches = db.execute(
-        models.organization_phones.select().where(
-            models.organization_phones.c.phone_number.ilike(f"%{phone_pattern}%")
+def get_search_facets(
+    db: Session,
+    name: Optional[str] = None,
+    building_id: Optional[int] = None,
+    activity_id: Optional[int] = None,
+    activity_name: Optional[str] = None,
+    limit: int = 10
+) -> schemas.SearchFacets:
+    """Total and top building/activity counts over the whole comprehensive search result.
+
+    Activity counts include organizations linked to descendants. Everything comes back from
+    a single UNION ALL statement, so facets cost one round trip whatever the page size.
+    """
+    matched = _comprehensive_query(db, name, building_id, activity_id, activity_name)\
+        .with_entities(
+            models.Organization.id.label("organization_id"),
+            models.Organization.building_id.label("building_id")
+        )\
+        .distinct()\
+        .subquery()
+    links = models.organization_activities
+    closure = _activity_closure(db)
+
+    total = select(
+        literal("total").label("facet"),
+        literal(0).label("id"),
+        literal("").label("name"),
+        func.count().label("count")
+    ).select_from(matched)
+
+    building_count = func.count(matched.c.organization_id)
+    buildings = select(
+        literal("building").label("facet"),
+        models.Building.id.label("id"),
+        models.Building.address.label("name"),
+        building_count.label("count")
+    )\
+        .join(matched, matched.c.building_id == models.Building.id)\
+        .group_by(models.Building.id, models.Building.address)\
+        .order_by(building_count.desc(), models.Building.id)\
+        .limit(limit)\
+        .subquery()
+
+    activity_count = func.count(distinct(links.c.organization_id))
+    activities = select(
+        literal("activity").label("facet"),
+        models.Activity.id.label("id"),
+        models.Activity.name.label("name"),
+        activity_count.label("count")
+    )\
+        .join(closure, closure.c.ancestor_id == models.Activity.id)\
+        .join(links, links.c.activity_id == closure.c.activity_id)\
+        .join(matched, matched.c.organization_id == links.c.organization_id)\
+        .group_by(models.Activity.id, models.Activity.name)\
+        .order_by(activity_count.desc(), models.Activity.id)\
+        .limit(limit)\
+        .subquery()
+
+    facets = schemas.SearchFacets(total=0, activities=[], buildings=[])
+    for facet, facet_id, facet_name, count in db.execute(
+        union_all(total, select(buildings), select(activities))
+    ):
+        if facet == "total":
+            facets.total = count
+        else:
+            bucket = facets.activities if facet == "activity" else facets.buildings
+            bucket.append(schemas.FacetCount(id=facet_id, name=facet_name, count=count))
+
+    # Members of a UNION ALL carry no guaranteed order across databases
+    facets.activities.sort(key=lambda item: (-item.count, item.id))
+    facets.buildings.sort(key=lambda item: (-item.count, item.id))
+    return facets
+
+def suggest(db: Session, query: str, limit: int = 10) -> schemas.Suggestions:
+    """Top `limit` organization names, activity names and building addresses with a word starting with `query`"""
+    found = suggest_index.suggest(db, query, limit)
+    return schemas.Suggestions(**{
+        key: [schemas.Suggestion(id=entity_id, text=text) for entity_id, text in found[entity]]
+        for key, entity in (("organizations", "organization"), ("activities", "activity"), ("buildings", "building"))
+    })
+
+def get_organizations_with_phones_by_pattern(db: Session, phone_pattern: str, skip: int = 0, limit: int = 100):
+    digits = models.phone_digits(phone_pattern)
+    if digits:
+        condition = models.organization_phones.c.phone_digits.like(f"%{digits}%")
+    else:
+        condition = models.organization_phones.c.phone_number.ilike(f"%{phone_pattern}%")
+
+    organization_ids = [
+        row.organization_id for row in db.execute(
+            select(models.organization_phones.c.organization_id)
+            .join(models.Organization, models.Organization.id == models.organization_phones.c.organization_id)
+            .where(condition)
+            .distinct()
+            .order_by(models.organization_phones.c.organization_id)
+            .offset(skip)
+            .limit(limit)
         )
-    ).fetchall()
+    ]
     
-    if not phone_matches:
+    if not organization_ids:
         return []
     
-    organization_ids = [match.organization_id for match in phone_matches]
-    
-    organizations = db.query(models.Organization)\
-        .options(joinedload(models.Organization.building))\
-        .options(joinedload(models.Organization.activities))\
+    organizations = _organization_query(db)\
         .filter(models.Organization.id.in_(organization_ids))\
+        .order_by(models.Organization.id)\
         .all()
     
-    return _add_phone_numbers_to_organizations(db, organizations)
\ No newline at end of file
+    return _hydrate_organizations(db, organizations)
+
+EXPORT_BATCH_SIZE = 1000
+
+def export_region(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """The session region's directory as plain records, in the order import_region() needs them.
+
+    A "region" header comes first, then buildings, activities (parents before children) and
+    organizations with their phones and activity ids; everything is read in id-keyed batches.
+    """
+    yield {"type": "region", "region": regions.current(db)}
+
+    last_id = 0
+    while True:
+        rows = db.query(models.Building.id, models.Building.address, models.Building.latitude, models.Building.longitude)\
+            .filter(models.Building.id > last_id)\
+            .order_by(models.Building.id)\
+            .limit(batch_size)\
+            .all()
+        if not rows:
+            break
+        for building_id, address, latitude, longitude in rows:
+            yield {"type": "building", "id": building_id, "address": address, "latitude": latitude, "longitude": longitude}
+        last_id = rows[-1].id
+
+    index = activity_index.get_index(db)
+    pending = list(index.children.get(None, []))
+    while pending:
+        activity_id = pending.pop(0)
+        yield {"type": "activity", "id": activity_id, "name": index.names[activity_id], "parent_id": index.parents[activity_id]}
+        pending.extend(index.children.get(activity_id, []))
+
+    links = models.organization_activities
+    phones = models.organization_phones
+    last_id = 0
+    while True:
+        rows = db.query(models.Organization.id, models.Organization.external_id, models.Organization.name, models.Organization.building_id)\
+            .filter(models.Organization.id > last_id)\
+            .order_by(models.Organization.id)\
+            .limit(batch_size)\
+            .all()
+        if not rows:
+            break
+        organization_ids = [row.id for row in rows]
+        activity_ids = {organization_id: [] for organization_id in organization_ids}
+        for row in db.execute(
+            select(links.c.organization_id, links.c.activity_id)
+            .where(links.c.organization_id.in_(organization_ids))
+            .order_by(links.c.activity_id)
+        ):
+            activity_ids[row.organization_id].append(row.activity_id)
+        phone_numbers = {organization_id: [] for organization_id in organization_ids}
+        for row in db.execute(
+            select(phones.c.organization_id, phones.c.phone_number)
+            .where(phones.c.organization_id.in_(organization_ids))
+            .order_by(phones.c.id)
+        ):
+            phone_numbers[row.organization_id].append(row.phone_number)
+
+        for organization_id, external_id, name, building_id in rows:
+            yield {
+                "type": "organization",
+                "id": organization_id,
+                "external_id": external_id,
+                "name": name,
+                "building_id": building_id,
+                "phone_numbers": phone_numbers[organization_id],
+                "activity_ids": activity_ids[organization_id],
+            }
+        last_id = rows[-1].id
+
+def import_region(db: Session, records: Iterable[dict], batch_size: int = EXPORT_BATCH_SIZE) -> dict:
+    """Load export_region() records into the session region; returns the number of each entity loaded.
+
+    Re-running an import is idempotent: buildings are matched by address, activities by name under
+    the same parent and organizations by external_id. Organizations exported without one are keyed
+    "<source region>:<source id>". Ids in the records are the source region's and are remapped.
+    """
+    source_region = None
+    building_ids = {}
+    activity_ids = {}
+    known_activities = None
+    counts = {"buildings": 0, "activities": 0, "organizations": 0}
+    buildings: List[dict] = []
+    organizations: List[dict] = []
+
+    def flush_buildings():
+        by_address = {}
+        for record in buildings:
+            by_address.setdefault(record["address"], []).append(record["id"])
+        for row in upsert_buildings(db, [
+            schemas.BuildingCreate(address=record["address"], latitude=record["latitude"], longitude=record["longitude"])
+            for record in buildings
+        ]):
+            for source_id in by_address[row["address"]]:
+                building_ids[source_id] = row["id"]
+        counts["buildings"] += len(by_address)
+        buildings.clear()
+
+    def flush_organizations():
+        upserted = upsert_organizations(db, [
+            schemas.OrganizationUpsert(
+                external_id=record["external_id"] or f"{source_region}:{record['id']}",
+                name=record["name"],
+                building_id=building_ids[record["building_id"]],
+                phone_numbers=record["phone_numbers"],
+                activity_ids=[activity_ids[activity_id] for activity_id in record["activity_ids"]],
+            )
+            for record in organizations
+        ])
+        counts["organizations"] += len(upserted)
+        organizations.clear()
+
+    for record in records:
+        kind = record["type"]
+        if kind == "region":
+            source_region = record["region"]
+        elif kind == "building":
+            buildings.append(record)
+            if len(buildings) >= batch_size:
+                flush_buildings()
+        elif kind == "activity":
+            if known_activities is None:
+                index = activity_index.get_index(db)
+                known_activities = {
+                    (parent_id, index.names[activity_id]): activity_id
+                    for activity_id, parent_id in index.parents.items()
+                }
+            parent_id = activity_ids[record["parent_id"]] if record["parent_id"] is not None else None
+            key = (parent_id, record["name"])
+            if key not in known_activities:
+                known_activities[key] = create_activity(
+                    db, schemas.ActivityCreate(name=record["name"], parent_id=parent_id)
+                ).id
+            activity_ids[record["id"]] = known_activities[key]
+            counts["activities"] += 1
+        elif kind == "organization":
+            if buildings:
+                flush_buildings()
+            organizations.append(record)
+            if len(organizations) >= batch_size:
+                flush_organizations()
+        else:
+            raise ValueError(f"Unknown record type: {kind}")
+
+    if buildings:
+        flush_buildings()
+    if organizations:
+        flush_organizations()
+    return counts
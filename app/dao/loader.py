@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .. import models
+from . import activity_index
+
+
+class RequestLoader:
+    """Request-scoped dataloader for the objects embedded in organization responses.
+
+    Buildings, activity links, activities (with their whole `children` subtrees) and phones are
+    fetched with one IN query per kind and attached with set_committed_value, so serialization
+    never falls back to lazy loading. Objects already hydrated during this session are reused.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.buildings: Dict[int, models.Building] = {}
+        self.activities: Dict[int, models.Activity] = {}
+
+    def load_buildings(self, building_ids: Iterable[int]) -> Dict[int, models.Building]:
+        missing = set(building_ids) - self.buildings.keys()
+        if missing:
+            for building in self.db.query(models.Building)\
+                    .options(raiseload('*'))\
+                    .filter(models.Building.id.in_(missing)):
+                self.buildings[building.id] = building
+        return self.buildings
+
+    def load_activities(self, activity_ids: Iterable[int]) -> Dict[int, models.Activity]:
+        """Load activities together with every descendant, wiring `children` in memory"""
+        index = activity_index.get_index(self.db)
+        wanted = set()
+        for activity_id in activity_ids:
+            if activity_id not in self.activities:
+                wanted |= index.subtree(activity_id)
+        missing = wanted - self.activities.keys()
+        if missing:
+            loaded = {
+                activity.id: activity
+                for activity in self.db.query(models.Activity)
+                .options(raiseload('*'))
+                .filter(models.Activity.id.in_(missing))
+            }
+            for activity_id, activity in loaded.items():
+                children = [
+                    loaded.get(child_id) or self.activities.get(child_id)
+                    for child_id in index.children.get(activity_id, [])
+                ]
+                set_committed_value(activity, 'children', [child for child in children if child is not None])
+            self.activities.update(loaded)
+        return self.activities
+
+    def hydrate_activities(self, activities: List[models.Activity]) -> List[models.Activity]:
+        self.load_activities(activity.id for activity in activities)
+        return activities
+
+    def hydrate_organizations(self, organizations: List[models.Organization]) -> List[models.Organization]:
+        if not organizations:
+            return organizations
+        organization_ids = [org.id for org in organizations]
+
+        links: Dict[int, List[int]] = {organization_id: [] for organization_id in organization_ids}
+        for row in self.db.execute(
+            select(models.organization_activities.c.organization_id, models.organization_activities.c.activity_id)
+            .where(models.organization_activities.c.organization_id.in_(organization_ids))
+        ):
+            links[row.organization_id].append(row.activity_id)
+
+        phones: Dict[int, List[str]] = {organization_id: [] for organization_id in organization_ids}
+        for row in self.db.execute(
+            select(models.organization_phones.c.organization_id, models.organization_phones.c.phone_number)
+            .where(models.organization_phones.c.organization_id.in_(organization_ids))
+            .order_by(models.organization_phones.c.id)
+        ):
+            phones[row.organization_id].append(row.phone_number)
+
+        buildings = self.load_buildings(org.building_id for org in organizations)
+        activities = self.load_activities(
+            activity_id for activity_ids in links.values() for activity_id in activity_ids
+        )
+
+        for org in organizations:
+            set_committed_value(org, 'building', buildings.get(org.building_id))
+            set_committed_value(org, 'activities', [
+                activities[activity_id] for activity_id in links[org.id] if activity_id in activities
+            ])
+            org._phone_numbers = phones[org.id]
+        return organizations
+
+
+def get_loader(db: Session) -> RequestLoader:
+    loader = db.info.get("loader")
+    if loader is None:
+        loader = db.info["loader"] = RequestLoader(db)
+    return loader
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_loader(session: Session) -> None:
+    # Commit/rollback expires the cached objects, so the next request for them must reload
+    session.info.pop("loader", None)
@@ -0,0 +1,210 @@
+import json
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import exists, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, raiseload
+
+from .. import models, schemas
+from ..config import settings
+from . import activity_index, loader
+
+REBUILD_BATCH_SIZE = 500
+
+
+def _activity_parents(db: Session) -> Dict[int, Optional[int]]:
+    return activity_index.get_index(db).parents
+
+
+def _with_ancestors(activity_ids: Iterable[int], parents: Dict[int, Optional[int]]) -> List[int]:
+    path_ids: Set[int] = set()
+    for activity_id in activity_ids:
+        while activity_id is not None and activity_id not in path_ids:
+            path_ids.add(activity_id)
+            activity_id = parents.get(activity_id)
+    return sorted(path_ids)
+
+
+def _build_documents(db: Session, organizations: List[models.Organization], parents: Dict[int, Optional[int]]):
+    loader.get_loader(db).hydrate_organizations(organizations)
+    return [
+        models.OrganizationDocument(
+            organization_id=org.id,
+            name=org.name,
+            building_id=org.building_id,
+            address=org.building.address,
+            latitude=org.building.latitude,
+            longitude=org.building.longitude,
+            activities=[
+                {"id": activity.id, "name": activity.name, "parent_id": activity.parent_id}
+                for activity in org.activities
+            ],
+            activity_path_ids=_with_ancestors((activity.id for activity in org.activities), parents),
+            phone_numbers=org._phone_numbers,
+        )
+        for org in organizations
+    ]
+
+
+def _load_organizations(db: Session):
+    return db.query(models.Organization).options(raiseload('*'))
+
+
+def refresh_documents(db: Session, organization_ids: List[int]) -> None:
+    """Rewrite the documents of the given organizations, dropping those that are gone.
+
+    Commits the caller's pending changes either way. With SEARCH_DOCUMENTS_ENABLED off nothing
+    reads the documents, so they are left alone; turning the flag on takes a rebuild.
+    """
+    if not settings.search_documents_enabled:
+        db.commit()
+        return
+
+    db.query(models.OrganizationDocument)\
+        .filter(models.OrganizationDocument.organization_id.in_(organization_ids))\
+        .delete(synchronize_session=False)
+
+    organizations = _load_organizations(db).filter(models.Organization.id.in_(organization_ids)).all()
+    if organizations:
+        db.add_all(_build_documents(db, organizations, _activity_parents(db)))
+    db.commit()
+
+
+def refresh_document(db: Session, organization_id: int) -> None:
+    refresh_documents(db, [organization_id])
+
+
+def rebuild_documents(db: Session, on_batch: Optional[Callable[[int], None]] = None) -> int:
+    """Regenerate every document from the normalized tables, returns the number written.
+
+    Works through organization id ranges, replacing each range's documents in its own short
+    transaction, so readers never see an empty table. `on_batch` is called with the running
+    total after each batch; raising from it stops the rebuild.
+    """
+    parents = _activity_parents(db)
+
+    written = 0
+    last_id = 0
+    while True:
+        organizations = _load_organizations(db)\
+            .filter(models.Organization.id > last_id)\
+            .order_by(models.Organization.id)\
+            .limit(REBUILD_BATCH_SIZE)\
+            .all()
+        if not organizations:
+            break
+
+        batch_last_id = organizations[-1].id
+        db.query(models.OrganizationDocument)\
+            .filter(models.OrganizationDocument.organization_id > last_id)\
+            .filter(models.OrganizationDocument.organization_id <= batch_last_id)\
+            .delete(synchronize_session=False)
+        db.add_all(_build_documents(db, organizations, parents))
+        db.commit()
+        db.expunge_all()
+
+        written += len(organizations)
+        last_id = batch_last_id
+        if on_batch is not None:
+            on_batch(written)
+
+    # Documents past the last organization belong to deleted organizations
+    db.query(models.OrganizationDocument)\
+        .filter(models.OrganizationDocument.organization_id > last_id)\
+        .delete(synchronize_session=False)
+    db.commit()
+    return written
+
+
+def _contains_any_activity(db: Session, activity_ids: Iterable[int]):
+    column = models.OrganizationDocument.activity_path_ids
+    activity_ids = list(activity_ids)
+    if db.get_bind().dialect.name == "postgresql":
+        # jsonb containment, served by the GIN (jsonb_path_ops) index
+        return or_(*[
+            column.op("@>")(literal(json.dumps([activity_id])).cast(JSONB))
+            for activity_id in activity_ids
+        ])
+
+    values = func.json_each(column).table_valued("value")
+    return exists(select(1).select_from(values).where(values.c.value.in_(activity_ids)))
+
+
+class _ActivityTrees:
+    """Activities with their `children` subtrees rebuilt from the activity index, as the normalized reads return them"""
+
+    def __init__(self, db: Session):
+        self.index = activity_index.get_index(db)
+        self.trees: Dict[int, schemas.Activity] = {}
+
+    def get(self, activity: dict) -> schemas.Activity:
+        activity_id = activity["id"]
+        if activity_id not in self.index.names:
+            # Deleted since the document was written; its links are gone at the next refresh
+            return schemas.Activity(**activity)
+        # Children before parents, without recursion (the hierarchy may be deep)
+        stack = [(activity_id, False)]
+        while stack:
+            current_id, expanded = stack.pop()
+            if current_id in self.trees:
+                continue
+            children = self.index.children.get(current_id, [])
+            if expanded:
+                self.trees[current_id] = schemas.Activity(
+                    id=current_id,
+                    name=self.index.names[current_id],
+                    parent_id=self.index.parents[current_id],
+                    children=[self.trees[child_id] for child_id in children],
+                )
+            else:
+                stack.append((current_id, True))
+                stack.extend((child_id, False) for child_id in children if child_id not in self.trees)
+        return self.trees[activity_id]
+
+
+def to_organization(document: models.OrganizationDocument, activities: _ActivityTrees) -> schemas.Organization:
+    return schemas.Organization(
+        id=document.organization_id,
+        name=document.name,
+        building_id=document.building_id,
+        phone_numbers=document.phone_numbers,
+        building=schemas.Building(
+            id=document.building_id,
+            address=document.address,
+            latitude=document.latitude,
+            longitude=document.longitude,
+        ),
+        activities=[activities.get(activity) for activity in document.activities],
+    )
+
+
+def search(
+    db: Session,
+    name: Optional[str] = None,
+    building_id: Optional[int] = None,
+    activity_filters: Iterable[Iterable[int]] = (),
+    skip: int = 0,
+    limit: Optional[int] = 100
+) -> List[schemas.Organization]:
+    """Single scan over organization_documents.
+
+    Each activity filter matches organizations having any of its ids among their
+    activities or those activities' ancestors; all filters must match.
+    """
+    query = db.query(models.OrganizationDocument)
+
+    if name:
+        query = query.filter(models.OrganizationDocument.name.ilike(f"%{name}%"))
+    if building_id:
+        query = query.filter(models.OrganizationDocument.building_id == building_id)
+    for activity_ids in activity_filters:
+        activity_ids = list(activity_ids)
+        if not activity_ids:
+            return []
+        query = query.filter(_contains_any_activity(db, activity_ids))
+
+    query = query.order_by(models.OrganizationDocument.organization_id).offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    activities = _ActivityTrees(db)
+    return [to_organization(document, activities) for document in query.all()]
@@ -0,0 +1,110 @@
+import os
+from typing import Dict
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, distinct, event, select
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
+
+from .. import models, regions
+from . import search_documents
+
+COPY_BATCH_SIZE = 5000
+
+# Copied as is; search documents are regenerated in the snapshot, the outbox and jobs stay behind
+TABLES = [
+    models.Building.__table__,
+    models.Activity.__table__,
+    models.Organization.__table__,
+    models.organization_phones,
+    models.organization_activities,
+]
+
+
+class ReadOnlySnapshot(Exception):
+    """A write attempted while serving from a snapshot; reported to the client as 405"""
+
+
+async def read_only_snapshot_handler(request: Request, exc: ReadOnlySnapshot):
+    return JSONResponse(
+        status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+        content={"detail": "This deployment serves a read-only snapshot of the directory"}
+    )
+
+
+def build(source: Session, path: str, batch_size: int = COPY_BATCH_SIZE) -> Dict[str, int]:
+    """Write every region of the directory to a compact SQLite file at `path`; returns rows per table.
+
+    The file is built next to `path` and moved into place at the end, so readers of an older
+    snapshot keep their (unlinked) file until they restart.
+    """
+    building = f"{path}.building"
+    if os.path.exists(building):
+        os.remove(building)
+    engine = create_engine(f"sqlite:///{building}")
+    counts = {}
+    try:
+        models.Base.metadata.create_all(engine)
+        connection = source.connection()
+        with engine.begin() as target:
+            for table in TABLES:
+                counts[table.name] = 0
+                result = connection.execution_options(yield_per=batch_size).execute(select(table))
+                for rows in result.mappings().partitions():
+                    target.execute(table.insert(), [dict(row) for row in rows])
+                    counts[table.name] += len(rows)
+
+        snapshot_regions = [
+            region for (region,) in source.query(distinct(models.Organization.region))
+            .execution_options(**{regions.ALL_REGIONS: True})
+        ]
+        counts[models.OrganizationDocument.__tablename__] = 0
+        for region in snapshot_regions:
+            db = regions.use(sessionmaker(bind=engine)(), region)
+            try:
+                counts[models.OrganizationDocument.__tablename__] += search_documents.rebuild_documents(db)
+            finally:
+                db.close()
+
+        with engine.connect() as target:
+            target.exec_driver_sql("ANALYZE")
+            target.exec_driver_sql("VACUUM")
+    finally:
+        engine.dispose()
+    os.replace(building, path)
+    return counts
+
+
+def create_engine_for(path: str, echo: bool = False):
+    """Read-only engine over a snapshot file.
+
+    `immutable=1` lets SQLite skip locking and change detection, and the whole file is
+    memory-mapped, so worker processes share its pages through the OS page cache.
+    """
+    path = os.path.abspath(path)
+    engine = create_engine(f"sqlite:///file:{path}?mode=ro&immutable=1&uri=true", echo=echo)
+    size = os.path.getsize(path)
+
+    @event.listens_for(engine, "connect")
+    def _map_file(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA mmap_size={size}")
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return engine
+
+
+def guard(session_factory: sessionmaker) -> None:
+    """Make sessions of `session_factory` raise ReadOnlySnapshot on any write"""
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _reject_write_statements(state: ORMExecuteState) -> None:
+        if state.is_insert or state.is_update or state.is_delete:
+            raise ReadOnlySnapshot()
+
+    @event.listens_for(session_factory, "before_flush")
+    def _reject_flush(session: Session, flush_context, instances) -> None:
+        if session.new or session.dirty or session.deleted:
+            raise ReadOnlySnapshot()
+
@@ -0,0 +1,172 @@
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from .. import models, regions
+from ..config import settings
+
+WORD = re.compile(r"\w+")
+
+# Entity name (as recorded in the change outbox) -> (model, text column)
+SOURCES = {
+    "organization": (models.Organization, models.Organization.name),
+    "activity": (models.Activity, models.Activity.name),
+    "building": (models.Building, models.Building.address),
+}
+
+
+def fold(text: str) -> str:
+    """Case- and Unicode-insensitive form: NFKC, casefold, ё -> е, punctuation dropped"""
+    folded = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    return " ".join(WORD.findall(folded))
+
+
+def _keys(text: str) -> List[str]:
+    """One key per word start, so "ООО Рога и Копыта" is found by "рог" and "копы" too"""
+    words = fold(text).split(" ")
+    return [" ".join(words[start:]) for start in range(len(words)) if words[start]]
+
+
+class PrefixIndex:
+    """Sorted (key, id) array for one entity kind, updated in place on writes"""
+
+    def __init__(self, rows: Iterable[Tuple[int, str]] = ()):
+        self.texts: Dict[int, str] = {}
+        self.entries: List[Tuple[str, int]] = []
+        for entity_id, text in rows:
+            self.texts[entity_id] = text
+            self.entries.extend((key, entity_id) for key in _keys(text))
+        self.entries.sort()
+
+    def remove(self, entity_id: int) -> None:
+        text = self.texts.pop(entity_id, None)
+        if text is None:
+            return
+        for key in _keys(text):
+            position = bisect.bisect_left(self.entries, (key, entity_id))
+            if position < len(self.entries) and self.entries[position] == (key, entity_id):
+                del self.entries[position]
+
+    def upsert(self, entity_id: int, text: str) -> None:
+        if self.texts.get(entity_id) == text:
+            return
+        self.remove(entity_id)
+        self.texts[entity_id] = text
+        for key in _keys(text):
+            bisect.insort(self.entries, (key, entity_id))
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[int, str]]:
+        result: List[Tuple[int, str]] = []
+        seen: Set[int] = set()
+        position = bisect.bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and len(result) < limit:
+            key, entity_id = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            if entity_id not in seen:
+                seen.add(entity_id)
+                result.append((entity_id, self.texts[entity_id]))
+            position += 1
+        return result
+
+
+class SuggestIndex:
+    def __init__(self, indexes: Dict[str, PrefixIndex], signature=None):
+        self.indexes = indexes
+        self.signature = signature
+
+    @classmethod
+    def load(cls, db: Session):
+        return cls(
+            {
+                entity: PrefixIndex(db.query(model.id, column).all())
+                for entity, (model, column) in SOURCES.items()
+            },
+            signature=_signature(db),
+        )
+
+    def apply(self, entity: str, entity_ids: Set[int], found: Dict[int, str]) -> None:
+        """Bring the given ids in line with `found` (id -> current text; absent ids were deleted)"""
+        index = self.indexes[entity]
+        for entity_id in entity_ids:
+            if entity_id in found:
+                index.upsert(entity_id, found[entity_id])
+            else:
+                index.remove(entity_id)
+
+    def suggest(self, query: str, limit: int) -> Dict[str, List[Tuple[int, str]]]:
+        prefix = fold(query)
+        if not prefix:
+            return {entity: [] for entity in self.indexes}
+        return {entity: index.search(prefix, limit) for entity, index in self.indexes.items()}
+
+
+def _signature(db: Session):
+    return tuple(
+        value
+        for model, _ in SOURCES.values()
+        for value in db.query(func.count(model.id), func.max(model.updated_at)).one()
+    )
+
+
+# Per region
+_indexes: Dict[str, SuggestIndex] = {}
+_checked_at: Dict[str, float] = {}
+_dirty: Dict[str, Dict[str, Set[int]]] = {}
+_lock = threading.Lock()
+
+
+def mark_dirty(db: Session, entity: str, entity_ids: Iterable[int]) -> None:
+    """Remember changed entities; they are re-read into the index once the transaction commits"""
+    if entity in SOURCES:
+        db.info.setdefault("suggest_dirty", {}).setdefault(entity, set()).update(entity_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_dirty(session: Session) -> None:
+    dirty = session.info.pop("suggest_dirty", None)
+    region = regions.current(session)
+    if dirty and region in _indexes:
+        with _lock:
+            pending = _dirty.setdefault(region, {})
+            for entity, entity_ids in dirty.items():
+                pending.setdefault(entity, set()).update(entity_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty(session: Session) -> None:
+    session.info.pop("suggest_dirty", None)
+
+
+def get_index(db: Session) -> SuggestIndex:
+    """Return the region's index with local writes applied, reloading it when another worker wrote"""
+    region = regions.current(db)
+    index = _indexes.get(region)
+    if index is None or time.monotonic() - _checked_at.get(region, 0.0) >= settings.suggest_index_poll_seconds:
+        _checked_at[region] = time.monotonic()
+        if index is None or _signature(db) != index.signature:
+            # Pending ids are kept: re-applying a change the reload already saw is harmless
+            index = SuggestIndex.load(db)
+            with _lock:
+                _indexes[region] = index
+
+    with _lock:
+        dirty = _dirty.pop(region, {})
+    for entity, entity_ids in dirty.items():
+        model, column = SOURCES[entity]
+        found = dict(db.query(model.id, column).filter(model.id.in_(entity_ids)).all())
+        with _lock:
+            index.apply(entity, entity_ids, found)
+    return index
+
+
+def suggest(db: Session, query: str, limit: int) -> Dict[str, List[Tuple[int, str]]]:
+    index = get_index(db)
+    with _lock:
+        return index.suggest(query, limit)
@@ -1,21 +1,187 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+import itertools
+import threading
+import time
 
-load_dotenv()
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+from .config import settings
+from . import regions
+from .dao import snapshot
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=True 
-)
+DATABASE_URL = settings.database_url
+
+READ_PRIMARY_HEADER = "x-read-primary"
+READ_PRIMARY_COOKIE = "read_primary_until"
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Session.info keys: whether the open transaction wrote, and what to call once such a transaction commits
+WROTE = "wrote"
+ON_WRITE_COMMIT = "on_write_commit"
+
+def pool_options():
+    """Split the total connection budget DB_MAX_CONNECTIONS evenly between worker processes"""
+    if not settings.db_max_connections:
+        return {}
+    per_worker = max(1, settings.db_max_connections // max(1, settings.web_concurrency))
+    return {"pool_size": per_worker, "max_overflow": 0, "pool_pre_ping": True}
+
+def enforce_foreign_keys(engine):
+    """SQLite ignores foreign keys (and so ON DELETE CASCADE) unless enabled per connection"""
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _enable_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+    return engine
+
+if settings.snapshot_path:
+    engine = snapshot.create_engine_for(settings.snapshot_path, echo=settings.db_echo)
+else:
+    engine = enforce_foreign_keys(create_engine(
+        DATABASE_URL,
+        echo=settings.db_echo,
+        **pool_options()
+    ))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if settings.snapshot_path:
+    snapshot.guard(SessionLocal)
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _note_write(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info[WROTE] = True
+
+@event.listens_for(SessionLocal, "after_flush")
+def _note_flush(session: Session, flush_context) -> None:
+    session.info[WROTE] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _written(session: Session) -> None:
+    if session.info.pop(WROTE, False) and ON_WRITE_COMMIT in session.info:
+        session.info[ON_WRITE_COMMIT]()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _rolled_back(session: Session) -> None:
+    session.info.pop(WROTE, None)
+
+def replica_connect_args(url: str):
+    """Bound how long a replica that stopped answering can hold a connection attempt"""
+    if url.startswith("postgresql"):
+        return {"connect_timeout": settings.replica_connect_timeout_seconds}
+    return {}
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine = enforce_foreign_keys(create_engine(
+            url,
+            echo=settings.db_echo,
+            connect_args=replica_connect_args(url),
+            **pool_options()
+        ))
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = True
+
+    def check(self) -> None:
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            self.healthy = True
+        except Exception:
+            self.healthy = False
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping those whose last health check failed.
+
+    Health checks run on a background thread (see start()), never inside a request.
+    """
 
-def get_db():
-    db = SessionLocal()
+    def __init__(self, urls):
+        self.replicas = [Replica(url) for url in urls]
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._monitor = None
+
+    def pick(self):
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = next(self._cycle)
+            if replica.healthy:
+                return replica
+        return None
+
+    def _check_periodically(self):
+        while not self._stop.wait(settings.replica_health_check_seconds):
+            for replica in self.replicas:
+                replica.check()
+
+    def start(self):
+        if self.replicas and self._monitor is None:
+            self._monitor = threading.Thread(target=self._check_periodically, name="replica-health", daemon=True)
+            self._monitor.start()
+
+    def dispose(self):
+        self._stop.set()
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+# A snapshot deployment has nothing to replicate
+replicas = ReplicaSet([] if settings.snapshot_path else settings.database_replica_urls)
+
+def warm_up_connection():
+    """Open the first pooled connection up front instead of on the first request"""
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+def _reads_from_primary(request: Request, read_only: bool) -> bool:
+    if not read_only:
+        return True
+    if request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true"):
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def session_for(request: Request, read_only: bool = None):
+    """Primary session for writes and read-your-writes requests, replica session for other reads.
+
+    Requests are reads by method unless `read_only` says otherwise.
+    """
+    if read_only is None:
+        read_only = request.method in READ_METHODS
+    if not _reads_from_primary(request, read_only):
+        replica = replicas.pick()
+        if replica is not None:
+            return replica.session_factory()
+    return SessionLocal()
+
+def _pin_to_primary(response: Response):
+    """Pin this client's follow-up reads to the primary until replicas have caught up"""
+    response.set_cookie(
+        READ_PRIMARY_COOKIE,
+        str(time.time() + settings.read_your_writes_seconds),
+        max_age=settings.read_your_writes_seconds,
+        httponly=True
+    )
+
+def _request_session(request: Request, response: Response, read_only: bool):
+    region = regions.from_request(request)
+    db = regions.use(session_for(request, read_only), region)
+    if replicas.replicas:
+        # Only a committed write makes replicas stale for this client
+        db.info[ON_WRITE_COMMIT] = lambda: _pin_to_primary(response)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_db(request: Request, response: Response):
+    yield from _request_session(request, response, request.method in READ_METHODS)
+
+def get_read_db(request: Request, response: Response):
+    """get_db for POST endpoints that only read (searches taking a JSON body); served by replicas"""
+    yield from _request_session(request, response, True)
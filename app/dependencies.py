@@ -1,15 +1,33 @@
-from fastapi import Header, HTTPException, status
-import os
-from dotenv import load_dotenv
+from fastapi import Depends, Header, HTTPException, status
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
 
-load_dotenv()
-
-API_KEY = os.getenv("API_KEY")
+from .config import settings
+from .database import get_read_db
+from .query_guard import QueryTooExpensive, is_timeout, set_statement_timeout
 
 def verify_api_key(x_api_key: str = Header(...)):
-    if x_api_key != API_KEY:
+    if x_api_key != settings.api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API Key"
         )
-    return x_api_key
\ No newline at end of file
+    return x_api_key
+
+def get_search_db(db: Session = Depends(get_read_db)):
+    """get_db for search endpoints: statements past SEARCH_STATEMENT_TIMEOUT_MS are cancelled"""
+    if not settings.search_statement_timeout_ms:
+        yield db
+        return
+
+    reset = set_statement_timeout(db, settings.search_statement_timeout_ms)
+    try:
+        yield db
+    except OperationalError as exc:
+        if not is_timeout(exc):
+            raise
+        raise QueryTooExpensive(
+            f"The search did not finish within {settings.search_statement_timeout_ms} ms, narrow it down"
+        ) from exc
+    finally:
+        reset()
@@ -0,0 +1,244 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import models, regions, schemas
+from .config import settings
+from .dao import dao, search_documents
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+IMPORT_BATCH_SIZE = 1000
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobTooLarge(ValueError):
+    pass
+
+
+class JobContext:
+    """Handed to job handlers to report progress and observe cancellation"""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+
+    def _update(self, **values) -> bool:
+        """Write job fields in a separate session; returns whether cancellation was requested"""
+        db = SessionLocal()
+        try:
+            job = db.get(models.Job, self.job_id)
+            for key, value in values.items():
+                setattr(job, key, value)
+            cancel_requested = job.cancel_requested
+            db.commit()
+            return cancel_requested
+        finally:
+            db.close()
+
+    def progress(self, done: int, total: int) -> None:
+        """Record progress, raising JobCancelled if cancellation was requested meanwhile.
+
+        Progress is best effort: a failed write (e.g. SQLite locked by the job's own
+        transaction) never fails the job.
+        """
+        try:
+            cancel_requested = self._update(progress=min(done / total, 1.0) if total else 1.0)
+        except OperationalError:
+            logger.debug("Could not record progress of job %s", self.job_id)
+            return
+        if cancel_requested:
+            raise JobCancelled()
+
+
+def _rebuild_search_documents(db: Session, context: JobContext, params: Dict[str, Any]):
+    total = db.query(models.Organization).count()
+    written = search_documents.rebuild_documents(db, on_batch=lambda done: context.progress(done, total))
+    return {"documents": written}
+
+
+def _delete_building(db: Session, context: JobContext, params: Dict[str, Any]):
+    deleted = dao.delete_building(db, params["building_id"], on_batch=context.progress)
+    if deleted is None:
+        raise ValueError("Building not found")
+    return {"deleted_organizations": deleted}
+
+
+def _import_organizations(db: Session, context: JobContext, params: Dict[str, Any]):
+    records = [schemas.OrganizationUpsert(**record) for record in params["organizations"]]
+    imported = 0
+    for start in range(0, len(records), IMPORT_BATCH_SIZE):
+        imported += len(dao.upsert_organizations(db, records[start:start + IMPORT_BATCH_SIZE]))
+        context.progress(start + IMPORT_BATCH_SIZE, len(records))
+    return {"imported": imported}
+
+
+HANDLERS: Dict[str, Callable[[Session, JobContext, Dict[str, Any]], Any]] = {
+    "rebuild_search_documents": _rebuild_search_documents,
+    "delete_building": _delete_building,
+    "import_organizations": _import_organizations,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_heartbeat: Optional[threading.Thread] = None
+_stop = threading.Event()
+# Jobs running in this process, kept alive by its heartbeat
+_running: Set[int] = set()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _heartbeat
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.job_workers, thread_name_prefix="job")
+        _stop.clear()
+        _heartbeat = threading.Thread(target=_beat, name="job-heartbeat", daemon=True)
+        _heartbeat.start()
+    return _executor
+
+
+def _beat() -> None:
+    """Renew the lease of this process's running jobs and reclaim those of processes that stopped"""
+    while not _stop.wait(settings.job_heartbeat_seconds):
+        db = SessionLocal()
+        try:
+            running = list(_running)
+            if running:
+                db.query(models.Job)\
+                    .filter(models.Job.id.in_(running), models.Job.status == RUNNING)\
+                    .update({"heartbeat_at": models.utcnow()}, synchronize_session=False)
+                db.commit()
+            _reclaim_stale(db)
+        except OperationalError:
+            # SQLite locked by a job's own transaction; the lease outlasts several missed beats
+            db.rollback()
+            logger.debug("Could not renew job leases")
+        finally:
+            db.close()
+
+
+def _reclaim_stale(db: Session) -> None:
+    """Requeue running jobs whose process stopped renewing their lease (crashed or restarted).
+
+    Handlers are safe to re-run from the start: imports upsert, deletes and rebuilds
+    pick up whatever is left. Jobs asked to cancel are cancelled instead.
+    """
+    now = models.utcnow()
+    jobs = models.Job.__table__
+    stale = [
+        jobs.c.status == RUNNING,
+        func.coalesce(jobs.c.heartbeat_at, jobs.c.started_at) < now - timedelta(seconds=settings.job_lease_seconds),
+    ]
+    if _running:
+        stale.append(jobs.c.id.not_in(list(_running)))
+    db.execute(jobs.update().where(*stale, jobs.c.cancel_requested.is_(True)).values(status=CANCELLED, finished_at=now))
+    reclaimed = db.execute(
+        jobs.update().where(*stale).values(status=QUEUED, started_at=None, heartbeat_at=None).returning(jobs.c.id)
+    ).scalars().all()
+    db.commit()
+    for job_id in reclaimed:
+        logger.warning("Reclaimed job %s from a process that stopped", job_id)
+        _get_executor().submit(_run, job_id)
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Move a queued job to running; only one worker (or process) can win"""
+    now = models.utcnow()
+    claimed = db.query(models.Job)\
+        .filter(models.Job.id == job_id, models.Job.status == QUEUED)\
+        .update({"status": RUNNING, "started_at": now, "heartbeat_at": now}, synchronize_session=False)
+    db.commit()
+    if claimed == 1:
+        _running.add(job_id)
+    return claimed == 1
+
+
+def _run(job_id: int) -> None:
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.get(models.Job, job_id)
+        kind, params = job.kind, job.params
+        regions.use(db, job.region)
+        context = JobContext(job_id)
+        try:
+            result = HANDLERS[kind](db, context, params)
+        except JobCancelled:
+            db.rollback()
+            context._update(status=CANCELLED, finished_at=models.utcnow())
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            db.rollback()
+            context._update(status=FAILED, error=str(exc), finished_at=models.utcnow())
+        else:
+            context._update(status=SUCCEEDED, progress=1.0, result=result, finished_at=models.utcnow())
+    finally:
+        _running.discard(job_id)
+        db.close()
+
+
+def submit(db: Session, job: schemas.JobCreate) -> models.Job:
+    """Raises JobTooLarge for params over JOB_MAX_PARAMS_BYTES; they are stored in the job row"""
+    size = len(json.dumps(job.params, ensure_ascii=False).encode())
+    if size > settings.job_max_params_bytes:
+        raise JobTooLarge(
+            f"Job params take {size} bytes, the limit is {settings.job_max_params_bytes}; split the job"
+        )
+    db_job = models.Job(kind=job.kind, params=job.params, status=QUEUED, region=regions.current(db))
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    _get_executor().submit(_run, db_job.id)
+    return db_job
+
+
+def get_job(db: Session, job_id: int) -> Optional[models.Job]:
+    return db.get(models.Job, job_id)
+
+
+def cancel(db: Session, job_id: int) -> Optional[models.Job]:
+    """Queued jobs are cancelled at once, running ones at their next progress report"""
+    job = db.get(models.Job, job_id)
+    if job is None:
+        return None
+    if job.status == QUEUED:
+        job.status = CANCELLED
+        job.finished_at = models.utcnow()
+    elif job.status == RUNNING:
+        job.cancel_requested = True
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def resume_queued(db: Session) -> None:
+    """Re-submit jobs left queued, or running past their lease, by a previous process; claiming keeps each run unique"""
+    executor = _get_executor()
+    _reclaim_stale(db)
+    for (job_id,) in db.query(models.Job.id).filter(models.Job.status == QUEUED):
+        executor.submit(_run, job_id)
+
+
+def shutdown() -> None:
+    global _executor, _heartbeat
+    _stop.set()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _heartbeat = None
@@ -1,20 +1,54 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from .database import engine
-from . import models
-from .api import organizations, buildings, activities
+from .config import settings
+from .database import engine, replicas, SessionLocal, warm_up_connection
+from . import models, jobs, query_guard, regions
+from .profiling import ProfilingMiddleware
+from .dao import building_index, snapshot
+from .compression import CompressionMiddleware
+from .api import organizations, buildings, activities, changes, suggest, profiles, jobs as jobs_api
+
+
+def startup():
+    if settings.auto_create_tables and not settings.snapshot_path:
+        models.Base.metadata.create_all(bind=engine)
 
+    warm_up_connection()
+    replicas.start()
 
-models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for region in settings.regions or [models.DEFAULT_REGION]:
+            building_index.warm(regions.use(db, region))
+        jobs.resume_queued(db)
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup()
+    yield
+    jobs.shutdown()
+    engine.dispose()
+    replicas.dispose()
 
 app = FastAPI(
     title="Organization Directory API",
     description="REST API для справочника Организаций, Зданий и Деятельности",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+app.add_middleware(CompressionMiddleware)
+# Outermost, so compression and error handling are part of the profile
+app.add_middleware(ProfilingMiddleware)
+app.add_exception_handler(query_guard.QueryTooExpensive, query_guard.query_too_expensive_handler)
+app.add_exception_handler(snapshot.ReadOnlySnapshot, snapshot.read_only_snapshot_handler)
+
 app.include_router(
     organizations.router,
     prefix="/api/organizations",
@@ -32,6 +66,31 @@ app.include_router(
     prefix="/api/activities",
     tags=["activities"]
 )
+
+app.include_router(
+    changes.router,
+    prefix="/api/changes",
+    tags=["changes"]
+)
+
+app.include_router(
+    suggest.router,
+    prefix="/api/suggest",
+    tags=["suggest"]
+)
+
+app.include_router(
+    profiles.router,
+    prefix="/api/profiles",
+    tags=["profiles"]
+)
+
+app.include_router(
+    jobs_api.router,
+    prefix="/api/jobs",
+    tags=["jobs"]
+)
+
 @app.get("/")
 def read_root():
     return {
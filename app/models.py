@@ -1,59 +1,128 @@
+import re
+from datetime import datetime
 from typing import List
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, Text
+from sqlalchemy import BigInteger, Boolean, Column, DDL, Integer, String, Float, ForeignKey, ForeignKeyConstraint, Table, Text, DateTime, Index, JSON, UniqueConstraint, event, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+# The trigram indexes below need pg_trgm; create_all() (fresh databases) installs it like the migrations do
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+DEFAULT_REGION = "default"
+
+def utcnow():
+    return datetime.utcnow()
+
+class RegionMixin:
+    """Tenant dimension (city/region); sessions only see and write rows of their region, see app.regions"""
+    region = Column(String(32), nullable=False, default=DEFAULT_REGION, server_default=DEFAULT_REGION)
+
 organization_phones = Table(
     'organization_phones',
     Base.metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('organization_id', Integer, ForeignKey('organizations.id', ondelete='CASCADE'), nullable=False),
-    Column('phone_number', String(20), nullable=False)
+    Column('organization_id', Integer, ForeignKey('organizations.id', ondelete='CASCADE'), nullable=False, index=True),
+    Column('phone_number', String(20), nullable=False),
+    Column('phone_digits', String(20), nullable=False, server_default='')
 )
 
+# Prefix (LIKE 'digits%') and substring (LIKE '%digits%') phone lookups; PostgreSQL operator classes
+Index(
+    'ix_organization_phones_phone_digits_prefix',
+    organization_phones.c.phone_digits,
+    postgresql_ops={'phone_digits': 'text_pattern_ops'}
+).ddl_if(dialect='postgresql')
+Index(
+    'ix_organization_phones_phone_digits_trgm',
+    organization_phones.c.phone_digits,
+    postgresql_using='gin',
+    postgresql_ops={'phone_digits': 'gin_trgm_ops'}
+).ddl_if(dialect='postgresql')
+
+def phone_digits(phone_number: str) -> str:
+    """Digits-only form of a phone number, used for format-insensitive search"""
+    return re.sub(r'\D', '', phone_number)
+
+# Links carry the region so the keys below make the database reject an activity of another region
 organization_activities = Table(
     'organization_activities',
     Base.metadata,
-    Column('organization_id', Integer, ForeignKey('organizations.id', ondelete='CASCADE')),
-    Column('activity_id', Integer, ForeignKey('activities.id', ondelete='CASCADE'))
+    Column('region', String(32), nullable=False),
+    Column('organization_id', Integer, index=True),
+    Column('activity_id', Integer, index=True),
+    ForeignKeyConstraint(['region', 'organization_id'], ['organizations.region', 'organizations.id'], ondelete='CASCADE'),
+    ForeignKeyConstraint(['region', 'activity_id'], ['activities.region', 'activities.id'], ondelete='CASCADE')
 )
 
-class Building(Base):
+class Building(RegionMixin, Base):
     __tablename__ = "buildings"
     
     id = Column(Integer, primary_key=True, index=True)
-    address = Column(String(255), nullable=False, unique=True, index=True)
+    address = Column(String(255), nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow, server_default=func.now())
+    
+    organizations = relationship("Organization", back_populates="building", cascade="all, delete-orphan", passive_deletes=True)
     
-    organizations = relationship("Organization", back_populates="building", cascade="all, delete-orphan")
+    __table_args__ = (
+        Index('ix_buildings_region_address', 'region', 'address', unique=True),
+        Index('ix_buildings_region_location', 'region', 'latitude', 'longitude'),
+        UniqueConstraint('region', 'id', name='uq_buildings_region_id'),
+    )
 
-class Activity(Base):
+class Activity(RegionMixin, Base):
     __tablename__ = "activities"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, index=True)
     parent_id = Column(Integer, ForeignKey('activities.id'), nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow, server_default=func.now())
     
     parent = relationship("Activity", remote_side=[id], back_populates="children")
     children = relationship("Activity", back_populates="parent")
     
     organizations = relationship("Organization", secondary=organization_activities, back_populates="activities")
+    
+    __table_args__ = (
+        Index('ix_activities_region_parent_id', 'region', 'parent_id'),
+        UniqueConstraint('region', 'id', name='uq_activities_region_id'),
+    )
 
-class Organization(Base):
+class Organization(RegionMixin, Base):
     __tablename__ = "organizations"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
-    building_id = Column(Integer, ForeignKey('buildings.id'), nullable=False)
+    building_id = Column(Integer, nullable=False)
+    external_id = Column(String(64), nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow, server_default=func.now())
     
     building = relationship("Building", back_populates="organizations")
     activities = relationship("Activity", secondary=organization_activities, back_populates="organizations")
     
+    __table_args__ = (
+        Index('ix_organizations_region_external_id', 'region', 'external_id', unique=True),
+        Index('ix_organizations_region_building_id', 'region', 'building_id'),
+        UniqueConstraint('region', 'id', name='uq_organizations_region_id'),
+        # The building must be in the organization's region
+        ForeignKeyConstraint(['region', 'building_id'], ['buildings.region', 'buildings.id'], ondelete='CASCADE'),
+    )
+    
     @property
     def phone_numbers(self) -> List[str]:
+        # Preloaded by the DAO for reads; avoids a query per organization during serialization
+        if '_phone_numbers' in self.__dict__:
+            return self._phone_numbers
         from .database import SessionLocal
         db = SessionLocal()
         try:
@@ -82,7 +151,8 @@ class Organization(Base):
                 db.execute(
                     organization_phones.insert().values(
                         organization_id=self.id,
-                        phone_number=phone_number
+                        phone_number=phone_number,
+                        phone_digits=phone_digits(phone_number)
                     )
                 )
                 db.commit()
@@ -117,9 +187,75 @@ class Organization(Base):
                 db.execute(
                     organization_phones.insert().values(
                         organization_id=self.id,
-                        phone_number=phone
+                        phone_number=phone,
+                        phone_digits=phone_digits(phone)
                     )
                 )
             db.commit()
         finally:
-            db.close()
\ No newline at end of file
+            db.close()
+
+class Change(RegionMixin, Base):
+    """Outbox of entity changes; the autoincrement id is the change feed cursor"""
+    __tablename__ = "changes"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=utcnow)
+    
+    __table_args__ = (
+        Index('ix_changes_region_id', 'region', 'id'),
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    # Region the job's session is scoped to; jobs themselves are visible from every region
+    region = Column(String(32), nullable=False, default=DEFAULT_REGION, server_default=DEFAULT_REGION)
+    params = Column(JSONType, nullable=False, default=dict)
+    progress = Column(Float, nullable=False, default=0.0)
+    result = Column(JSONType, nullable=True)
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    started_at = Column(DateTime, nullable=True)
+    # Renewed by the running process; a running job whose heartbeat is older than the lease is reclaimed
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class OrganizationDocument(RegionMixin, Base):
+    """Denormalized read model of an organization, maintained by the DAO on every organization write"""
+    __tablename__ = "organization_documents"
+    
+    organization_id = Column(Integer, ForeignKey('organizations.id', ondelete='CASCADE'), primary_key=True)
+    name = Column(String(255), nullable=False, index=True)
+    building_id = Column(Integer, nullable=False, index=True)
+    address = Column(String(255), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    activities = Column(JSONType, nullable=False, default=list)
+    activity_path_ids = Column(JSONType, nullable=False, default=list)
+    phone_numbers = Column(JSONType, nullable=False, default=list)
+    
+    __table_args__ = (
+        Index(
+            'ix_organization_documents_activity_path_ids',
+            'activity_path_ids',
+            postgresql_using='gin',
+            postgresql_ops={'activity_path_ids': 'jsonb_path_ops'}
+        ),
+        Index('ix_organization_documents_region_organization_id', 'region', 'organization_id'),
+        # Name search matches substrings (ILIKE '%...%'), as on the normalized tables. A tsvector
+        # matches whole lexemes only, so it could not serve it; the trigram index does
+        Index(
+            'ix_organization_documents_name_trgm',
+            'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
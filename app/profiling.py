@@ -0,0 +1,320 @@
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Header, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+PROFILE_HEADER = "X-Profile"
+PHASES = ("db", "orm", "validation", "serialization", "app")
+
+# Innermost matching frame decides the phase of a sample; anything else is "app"
+_PHASE_RULES: List[Tuple[str, str, Optional[str]]] = [
+    ("db", "/sqlalchemy/engine/", None),
+    ("db", "/sqlalchemy/pool/", None),
+    ("db", "/sqlalchemy/dialects/", None),
+    ("db", "/sqlalchemy/sql/", None),
+    ("db", "/sqlite3/", None),
+    ("db", "/psycopg2/", None),
+    ("orm", "/sqlalchemy/orm/", None),
+    ("validation", "/pydantic/", None),
+    ("validation", "/fastapi/_compat", "validate"),
+    ("serialization", "/fastapi/_compat", "serialize"),
+    ("serialization", "/fastapi/encoders.py", None),
+    ("serialization", "/json/", None),
+    ("serialization", "/starlette/responses.py", None),
+    ("serialization", "/app/compression.py", None),
+]
+
+# Event loop and thread pool internals; a stack made only of these is not doing request work
+_MACHINERY = ("/asyncio/", "/anyio/", "/threading.py", "/concurrent/")
+
+_profile: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+
+
+def _phase(frames) -> str:
+    for frame in reversed(frames):
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        for phase, path, function in _PHASE_RULES:
+            if path in filename and (function is None or function in frame.f_code.co_name):
+                return phase
+    return "app"
+
+
+def _dispatching_frame(frames) -> Tuple[Optional[contextvars.Context], int]:
+    """Context the thread is running and the position of the frame that entered it.
+
+    Worker threads run request code as `context.run(func)` (anyio WorkerThread.run) and the event
+    loop runs each task step through `Handle._run`, which holds the task's context; the innermost
+    such frame tells which request (if any) the stack belongs to.
+    """
+    for position in range(len(frames) - 1, -1, -1):
+        frame = frames[position]
+        if frame.f_code.co_name in ("run", "_run"):
+            local = frame.f_locals
+            context = local.get("context")
+            if not isinstance(context, contextvars.Context):
+                context = getattr(local.get("self"), "_context", None)
+            if isinstance(context, contextvars.Context):
+                return context, position
+    return None, 0
+
+
+def _is_machinery(frame) -> bool:
+    filename = frame.f_code.co_filename.replace("\\", "/")
+    return any(part in filename for part in _MACHINERY)
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_code.co_firstlineno})"
+
+
+class Profile:
+    """Stack samples of one request, collected by a background thread while it runs"""
+
+    def __init__(self, method: str, path: str, interval_ms: float):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.phases: Dict[str, float] = {phase: 0.0 for phase in PHASES}
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self._stop = threading.Event()
+        self._saved = False
+        self._thread = threading.Thread(target=self._sample, name=f"profile-{self.id[:8]}", daemon=True)
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Tell the sampler to stop; cheap enough for the event loop"""
+        if not self._stop.is_set():
+            self.duration_ms = (time.perf_counter() - self._started) * 1000
+            self._stop.set()
+
+    def finish(self) -> None:
+        """Wait for the sampler and write the profile out; blocks, so run it in the thread pool"""
+        self.stop()
+        if self._saved:
+            return
+        self._saved = True
+        self._thread.join()
+        save(self)
+
+    def _sample(self) -> None:
+        sampler_id = threading.get_ident()
+        last = time.perf_counter()
+        # Other threads hold the GIL for up to sys.getswitchinterval() (5 ms), so samples of
+        # CPU-bound code come less often than the interval; weighting by elapsed time keeps totals right
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight_ms = (now - last) * 1000
+            last = now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+                frames.reverse()
+                context, position = _dispatching_frame(frames)
+                if context is None or context.get(_profile) is not self:
+                    continue
+                # Thread and event loop machinery above the dispatching frame is the same in every sample
+                frames = frames[position + 1:]
+                if all(_is_machinery(frame) for frame in frames):
+                    continue
+                phase = _phase(frames)
+                self.phases[phase] += weight_ms
+                self.stacks[";".join([phase] + [_frame_name(frame) for frame in frames])] += weight_ms
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            [f"{phase};dur={duration:.1f}" for phase, duration in self.phases.items()]
+            + [f"profile;desc={self.id}"]
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "interval_ms": self.interval * 1000,
+            "phases_ms": self.phases,
+            "stacks_ms": dict(self.stacks),
+        }
+
+
+def _profile_path(profile_id: str) -> str:
+    return os.path.join(settings.profiling_dir, f"{profile_id}.json")
+
+
+def save(profile: Profile) -> None:
+    """Profiles go to a directory rather than memory so any worker can serve the download"""
+    os.makedirs(settings.profiling_dir, exist_ok=True)
+    with open(_profile_path(profile.id), "w") as output:
+        json.dump(profile.to_dict(), output)
+    prune()
+
+
+def prune() -> None:
+    """Delete profiles older than PROFILING_MAX_AGE_SECONDS, then the oldest above PROFILING_MAX_FILES"""
+    expires = time.time() - settings.profiling_max_age_seconds
+    kept = []
+    with os.scandir(settings.profiling_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                modified = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if modified < expires:
+                _remove(entry.path)
+            else:
+                kept.append((modified, entry.path))
+    kept.sort()
+    for _, path in kept[:max(len(kept) - settings.profiling_max_files, 0)]:
+        _remove(path)
+
+
+def _remove(path: str) -> None:
+    # Another worker may be pruning the same directory
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def load(profile_id: str) -> Optional[dict]:
+    try:
+        uuid.UUID(hex=profile_id)
+    except ValueError:
+        return None
+    try:
+        with open(_profile_path(profile_id)) as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return None
+
+
+def to_collapsed(profile: dict) -> str:
+    """Brendan Gregg's folded format (flamegraph.pl, speedscope); values are microseconds"""
+    return "".join(
+        f"{stack} {round(duration_ms * 1000)}\n" for stack, duration_ms in sorted(profile["stacks_ms"].items())
+    )
+
+
+def to_speedscope(profile: dict) -> dict:
+    frames: List[dict] = []
+    frame_index: Dict[str, int] = {}
+    samples = []
+    weights = []
+    for stack, duration_ms in profile["stacks_ms"].items():
+        sample = []
+        for name in stack.split(";"):
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                function, _, location = name.partition(" (")
+                filename, _, line = location.rstrip(")").rpartition(":")
+                frames.append({"name": function, "file": filename, "line": int(line)} if location else {"name": name})
+            sample.append(frame_index[name])
+        samples.append(sample)
+        weights.append(duration_ms)
+
+    title = f"{profile['method']} {profile['path']}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": title,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": title,
+        "activeProfileIndex": 0,
+        "exporter": "organization-directory",
+    }
+
+
+def _requested(headers: Headers) -> bool:
+    token = headers.get(PROFILE_HEADER)
+    if token is not None and settings.profiling_token and token == settings.profiling_token:
+        return True
+    return settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate
+
+
+def verify_profiling_token(x_profile: str = Header(...)):
+    if not settings.profiling_token or x_profile != settings.profiling_token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token")
+    return x_profile
+
+
+class ProfilingMiddleware:
+    """Samples requests carrying the admin X-Profile token (or a PROFILING_SAMPLE_RATE share of all).
+
+    The response gets `Server-Timing` with the time per phase and `X-Profile-Id` naming the
+    profile, downloadable from /api/profiles/{id}.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _requested(Headers(scope=scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], settings.profiling_interval_ms)
+        response_start: Optional[Message] = None
+
+        async def send_with_profile(message: Message) -> None:
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                # Held back until the body is complete, so the headers can carry the timings
+                response_start = message
+                return
+            if message["type"] == "http.response.body":
+                final = not message.get("more_body", False)
+                if final:
+                    profile.stop()
+                    await run_in_threadpool(profile.finish)
+                if response_start is not None:
+                    headers = MutableHeaders(scope=response_start)
+                    headers["X-Profile-Id"] = profile.id
+                    # A streamed body has no timings yet when its headers go out; the file has them
+                    if final:
+                        headers["Server-Timing"] = profile.server_timing()
+                    await send(response_start)
+                    response_start = None
+            await send(message)
+
+        token = _profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _profile.reset(token)
+            profile.stop()
+            await run_in_threadpool(profile.finish)
@@ -0,0 +1,81 @@
+import json
+import time
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .config import settings
+
+# Progress handler granularity for SQLite: VM instructions between deadline checks
+SQLITE_PROGRESS_STEPS = 10000
+
+# SQLSTATE of a statement cancelled by statement_timeout (psycopg2 QueryCanceled)
+POSTGRES_QUERY_CANCELED = "57014"
+
+
+class QueryTooExpensive(Exception):
+    """A search request exceeding the configured limits; reported to the client as 422"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+async def query_too_expensive_handler(request: Request, exc: QueryTooExpensive):
+    return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": exc.detail})
+
+
+def check_radius(radius_km: float) -> None:
+    if radius_km > settings.search_max_radius_km:
+        raise QueryTooExpensive(f"radius_km must not exceed {settings.search_max_radius_km:g}")
+
+
+def check_pattern(value, field: str) -> None:
+    if value is not None and len(value.strip()) < settings.search_min_pattern_length:
+        raise QueryTooExpensive(f"{field} must be at least {settings.search_min_pattern_length} characters long")
+
+
+def check_limit(limit: int, field: str = "limit") -> None:
+    if limit > settings.search_max_results:
+        raise QueryTooExpensive(f"{field} must not exceed {settings.search_max_results}")
+
+
+def check_estimate(db: Session, query) -> None:
+    """Reject a query whose planner row estimate is too large (PostgreSQL only, off by default)"""
+    if not settings.search_max_estimated_rows or db.get_bind().dialect.name != "postgresql":
+        return
+    statement = query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    if plan[0]["Plan"]["Plan Rows"] > settings.search_max_estimated_rows:
+        raise QueryTooExpensive("The search is estimated to scan too many rows, narrow it down")
+
+
+def set_statement_timeout(db: Session, timeout_ms: int):
+    """Bound every statement of the request's transaction; returns a callable undoing it"""
+    connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        # SET LOCAL ends with the transaction, which the session closes at the end of the request
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        return lambda: None
+
+    if connection.dialect.name == "sqlite":
+        raw = connection.connection.driver_connection
+        deadline = time.monotonic() + timeout_ms / 1000
+        raw.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+        # The pooled connection outlives the request, so the handler must be removed
+        return lambda: raw.set_progress_handler(None, SQLITE_PROGRESS_STEPS)
+
+    return lambda: None
+
+
+def is_timeout(exc: DBAPIError) -> bool:
+    """Whether `exc` is a statement cancelled by set_statement_timeout rather than a real error"""
+    if getattr(exc.orig, "pgcode", None) == POSTGRES_QUERY_CANCELED:
+        return True
+    # The SQLite progress handler aborts the statement with "interrupted"
+    return str(exc.orig) == "interrupted"
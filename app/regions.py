@@ -0,0 +1,65 @@
+import re
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+from . import models
+from .config import settings
+
+REGION_HEADER = "x-region"
+
+# Execution option lifting the region filter, for maintenance across every region
+ALL_REGIONS = "all_regions"
+
+_REGION_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+
+def current(db: Session) -> str:
+    """Region the session reads and writes, DEFAULT_REGION unless scoped with use()"""
+    return db.info.get("region", models.DEFAULT_REGION)
+
+
+def use(db: Session, region: str) -> Session:
+    db.info["region"] = region
+    return db
+
+
+def validate(region: str) -> str:
+    region = region.strip().lower()
+    if not _REGION_NAME.match(region) or (settings.regions and region not in settings.regions):
+        raise ValueError(f"Unknown region: {region}")
+    return region
+
+
+def from_request(request: Request) -> str:
+    try:
+        return validate(request.headers.get(REGION_HEADER, models.DEFAULT_REGION))
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_region(state: ORMExecuteState) -> None:
+    """Add `region = <session region>` to every ORM SELECT/UPDATE/DELETE touching a regional model.
+
+    Core statements on plain tables (links, phones) are not filtered; the DAO joins them to a
+    regional model or passes the region explicitly.
+    """
+    if not (state.is_select or state.is_update or state.is_delete):
+        return
+    if state.is_column_load or state.is_relationship_load or state.execution_options.get(ALL_REGIONS):
+        return
+    region = current(state.session)
+    state.statement = state.statement.options(with_loader_criteria(
+        models.RegionMixin,
+        lambda cls: cls.region == region,
+        include_aliases=True,
+    ))
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_region(session: Session, flush_context, instances) -> None:
+    for instance in session.new:
+        if isinstance(instance, models.RegionMixin) and instance.region is None:
+            instance.region = current(session)
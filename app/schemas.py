@@ -1,6 +1,8 @@
 import re
-from pydantic import BaseModel, ConfigDict, field_validator
-from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Any, Dict, List, Optional, Union
 
 class PhoneNumber(BaseModel):
     number: str
@@ -31,6 +33,13 @@ class OrganizationCreate(OrganizationBase):
                 raise ValueError(f'Invalid phone number format: {phone}')
         return v
 
+class OrganizationUpsert(OrganizationCreate):
+    external_id: str
+
+class OrganizationUpsertResult(BaseModel):
+    id: int
+    external_id: str
+
 class OrganizationUpdate(BaseModel):
     name: Optional[str] = None
     building_id: Optional[int] = None
@@ -49,6 +58,33 @@ class OrganizationUpdate(BaseModel):
                     raise ValueError(f'Invalid phone number format: {phone}')
         return v
 
+class PhonesPatch(BaseModel):
+    add: List[str] = []
+    remove: List[str] = []
+    
+    @field_validator('add')
+    @classmethod
+    def validate_phone_numbers(cls, v):
+        for phone in v:
+            if not re.match(r'^[\d\s\-+()\.]+$', phone):
+                raise ValueError(f'Invalid phone number format: {phone}')
+        return v
+
+class ActivitiesPatch(BaseModel):
+    add: List[int] = []
+    remove: List[int] = []
+
+class DeletedOrganizations(BaseModel):
+    deleted_ids: List[int]
+
+class OrganizationPhones(BaseModel):
+    organization_id: int
+    phone_numbers: List[str]
+
+class OrganizationActivities(BaseModel):
+    organization_id: int
+    activity_ids: List[int]
+
 class Organization(OrganizationBase):
     id: int
     phone_numbers: List[str] = []
@@ -102,6 +138,47 @@ class OrganizationSimple(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class ResponseFormat(str, Enum):
+    full = "full"
+    normalized = "normalized"
+
+class ActivityFlat(ActivityBase):
+    id: int
+    parent_id: Optional[int] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class OrganizationNormalized(OrganizationBase):
+    id: int
+    phone_numbers: List[str] = []
+    activity_ids: List[int] = []
+
+class NormalizedOrganizationList(BaseModel):
+    organizations: List[OrganizationNormalized]
+    buildings: Dict[int, Building]
+    activities: Dict[int, ActivityFlat]
+    
+    @classmethod
+    def from_organizations(cls, organizations):
+        """Side-load every building and activity once instead of nesting them per organization"""
+        items = []
+        buildings = {}
+        activities = {}
+        for org in organizations:
+            items.append(OrganizationNormalized(
+                id=org.id,
+                name=org.name,
+                building_id=org.building_id,
+                phone_numbers=org._phone_numbers if hasattr(org, '_phone_numbers') else org.phone_numbers,
+                activity_ids=[activity.id for activity in org.activities]
+            ))
+            if org.building_id not in buildings:
+                buildings[org.building_id] = Building.model_validate(org.building)
+            for activity in org.activities:
+                if activity.id not in activities:
+                    activities[activity.id] = ActivityFlat.model_validate(activity)
+        return cls(organizations=items, buildings=buildings, activities=activities)
+
 class Coordinate(BaseModel):
     latitude: float
     longitude: float
@@ -110,10 +187,83 @@ class RadiusSearch(BaseModel):
     center: Coordinate
     radius_km: float
 
+class NearestSearch(BaseModel):
+    center: Coordinate
+    limit: int = Field(10, ge=1, le=1000)
+
 class RectangleSearch(BaseModel):
     north_east: Coordinate
     south_west: Coordinate
 
+class Suggestion(BaseModel):
+    id: int
+    text: str
+
+class Suggestions(BaseModel):
+    organizations: List[Suggestion]
+    activities: List[Suggestion]
+    buildings: List[Suggestion]
+
+class FacetCount(BaseModel):
+    id: int
+    name: str
+    count: int
+
+class SearchFacets(BaseModel):
+    total: int
+    activities: List[FacetCount]
+    buildings: List[FacetCount]
+
+# Organization pages are nested by default, side-loaded with ?format=normalized
+OrganizationList = Union[List[Organization], NormalizedOrganizationList]
+
+class FacetedOrganizationSearch(BaseModel):
+    organizations: OrganizationList
+    facets: SearchFacets
+
+class GridStatsRequest(RectangleSearch):
+    rows: int = Field(10, ge=1, le=100)
+    columns: int = Field(10, ge=1, le=100)
+
+class ActivityCount(BaseModel):
+    activity_id: int
+    name: str
+    parent_id: Optional[int] = None
+    direct_count: int
+    total_count: int
+
+class BuildingCount(BaseModel):
+    building_id: int
+    address: str
+    latitude: float
+    longitude: float
+    organization_count: int
+
+class GridCellCount(BaseModel):
+    row: int
+    column: int
+    north_east: Coordinate
+    south_west: Coordinate
+    organization_count: int
+
+class JobCreate(BaseModel):
+    kind: str
+    params: Dict[str, Any] = {}
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
 class PaginatedResponse(BaseModel):
     items: List
     total: int
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import json
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUNS = int(os.getenv("STARTUP_BENCH_RUNS", "5"))
+BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+
+# Runs in a fresh interpreter each time so module caches never hide the cold-start cost
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def run_lifespan():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(run_lifespan())
+finished = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "lifespan_ms": (finished - imported) * 1000}))
+"""
+
+def measure():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def bench_startup():
+    samples = [measure() for _ in range(RUNS)]
+    import_ms = statistics.median(sample["import_ms"] for sample in samples)
+    lifespan_ms = statistics.median(sample["lifespan_ms"] for sample in samples)
+    total_ms = import_ms + lifespan_ms
+
+    print(f"runs: {RUNS}")
+    print(f"import:   {import_ms:8.1f} ms (median)")
+    print(f"lifespan: {lifespan_ms:8.1f} ms (median)")
+    print(f"total:    {total_ms:8.1f} ms (budget {BUDGET_MS:.0f} ms)")
+    return total_ms <= BUDGET_MS
+
+if __name__ == "__main__":
+    sys.exit(0 if bench_startup() else 1)
@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.database import SessionLocal
+from app.dao import snapshot
+
+def build(path: str):
+    db = SessionLocal()
+    try:
+        counts = snapshot.build(db, path)
+        print(f"Wrote {path} ({os.path.getsize(path)} bytes): " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: build_snapshot.py PATH")
+    build(sys.argv[1])
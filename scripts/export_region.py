@@ -0,0 +1,26 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.database import SessionLocal
+from app import regions
+from app.dao import dao
+
+def export(region: str, path: str):
+    """Write the region's directory to `path` as JSON lines ("-" for stdout)"""
+    region = regions.validate(region)
+    db = regions.use(SessionLocal(), region)
+    output = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+    try:
+        for record in dao.export_region(db):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: export_region.py REGION PATH")
+    export(sys.argv[1], sys.argv[2])
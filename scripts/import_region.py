@@ -0,0 +1,26 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.database import SessionLocal
+from app import regions
+from app.dao import dao
+
+def load(region: str, path: str):
+    """Load an export_region.py file into `region` (which may differ from the exported one)"""
+    region = regions.validate(region)
+    db = regions.use(SessionLocal(), region)
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        counts = dao.import_region(db, (json.loads(line) for line in source if line.strip()))
+        print(f"Imported into {region}: " + ", ".join(f"{count} {entity}" for entity, count in counts.items()))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: import_region.py REGION PATH")
+    load(sys.argv[1], sys.argv[2])
@@ -0,0 +1,404 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+import httpx
+
+from app.config import settings
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASE_URL = os.getenv("LOAD_TEST_URL", "http://127.0.0.1:8000")
+API_KEY = os.getenv("LOAD_TEST_API_KEY", settings.api_key or "")
+CONCURRENCY = int(os.getenv("LOAD_TEST_CONCURRENCY", "20"))
+DURATION = float(os.getenv("LOAD_TEST_DURATION", "30"))
+WARMUP = float(os.getenv("LOAD_TEST_WARMUP", "5"))
+THINK_TIME_MS = float(os.getenv("LOAD_TEST_THINK_TIME_MS", "0"))
+SEED = int(os.getenv("LOAD_TEST_SEED", "42"))
+TIMEOUT = float(os.getenv("LOAD_TEST_TIMEOUT", "10"))
+# Starts scripts/serve.py on the port of LOAD_TEST_URL against DATABASE_URL, stops it afterwards
+SERVE = os.getenv("LOAD_TEST_SERVE", "false").lower() == "true"
+OUTPUT = os.getenv("LOAD_TEST_OUTPUT")
+
+DATASET_BUILDINGS = int(os.getenv("LOAD_TEST_BUILDINGS", "200"))
+DATASET_ORGANIZATIONS = int(os.getenv("LOAD_TEST_ORGANIZATIONS", "2000"))
+
+CENTER = (55.7558, 37.6173)
+SPREAD_DEGREES = 0.2
+NAME_WORDS = ["Рога", "Копыта", "Авто", "Мир", "Техно", "Сервис", "Молоко", "Хлеб", "Строй", "Маркет", "Дом", "Софт"]
+ACTIVITY_TREE = {
+    "Еда": {"Мясная продукция": {}, "Молочная продукция": {"Сыры": {}}},
+    "Автомобили": {"Грузовые": {}, "Легковые": {"Запчасти": {}, "Аксессуары": {}}},
+    "IT услуги": {"Разработка ПО": {}, "Техподдержка": {}},
+}
+
+
+class Dataset:
+    """Ids and names the profiles draw from, created through the API once and reused"""
+
+    def __init__(self):
+        self.building_ids = []
+        self.activity_ids = []
+        self.activity_names = []
+        self.organization_ids = []
+
+
+def _organization_name(rng, index):
+    return f"ООО \"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)}\" {index}"
+
+
+def _phone(rng):
+    return f"{rng.randint(1, 9)}-{rng.randint(100, 999)}-{rng.randint(100, 999)}"
+
+
+async def _create_activities(client, tree, parent_id, existing):
+    for name, subtree in tree.items():
+        activity_id = existing.get((name, parent_id))
+        if activity_id is None:
+            response = await client.post("/api/activities/", json={"name": name, "parent_id": parent_id})
+            response.raise_for_status()
+            activity_id = response.json()["id"]
+        await _create_activities(client, subtree, activity_id, existing)
+
+
+async def prepare_dataset(client) -> Dataset:
+    """Idempotently upsert a seeded dataset: buildings by address, organizations by external_id"""
+    rng = random.Random(SEED)
+    dataset = Dataset()
+
+    response = await client.get("/api/activities/", params={"limit": 10000})
+    response.raise_for_status()
+    existing = {(activity["name"], activity["parent_id"]): activity["id"] for activity in response.json()}
+    await _create_activities(client, ACTIVITY_TREE, None, existing)
+    response = await client.get("/api/activities/", params={"limit": 10000})
+    response.raise_for_status()
+    for activity in response.json():
+        dataset.activity_ids.append(activity["id"])
+        dataset.activity_names.append(activity["name"])
+
+    buildings = [
+        {
+            "address": f"г. Москва, нагрузочный тест {index}",
+            "latitude": CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+            "longitude": CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+        }
+        for index in range(DATASET_BUILDINGS)
+    ]
+    response = await client.put("/api/buildings/", json=buildings)
+    response.raise_for_status()
+    dataset.building_ids = [building["id"] for building in response.json()]
+
+    for start in range(0, DATASET_ORGANIZATIONS, 500):
+        organizations = [
+            {
+                "external_id": f"load-test-{index}",
+                "name": _organization_name(rng, index),
+                "building_id": rng.choice(dataset.building_ids),
+                "phone_numbers": [_phone(rng) for _ in range(rng.randint(1, 3))],
+                "activity_ids": rng.sample(dataset.activity_ids, rng.randint(1, 3)),
+            }
+            for index in range(start, min(start + 500, DATASET_ORGANIZATIONS))
+        ]
+        response = await client.put("/api/organizations/", json=organizations)
+        response.raise_for_status()
+        dataset.organization_ids.extend(result["id"] for result in response.json())
+    return dataset
+
+
+class VirtualUser:
+    """One closed-loop client: its own random stream, ETag cache and created organizations"""
+
+    def __init__(self, client, dataset: Dataset, rng: random.Random):
+        self.client = client
+        self.dataset = dataset
+        self.rng = rng
+        self.etags = {}
+        self.created = []
+
+    def _point(self):
+        return {
+            "latitude": CENTER[0] + self.rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+            "longitude": CENTER[1] + self.rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+        }
+
+    async def _revalidating_get(self, url, **kwargs):
+        """GET that sends back the last ETag, as browsers and map tiles clients do"""
+        headers = {}
+        if url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        response = await self.client.get(url, headers=headers, **kwargs)
+        if "etag" in response.headers:
+            self.etags[url] = response.headers["etag"]
+        return response
+
+    # Search operations
+
+    async def search_name(self):
+        return "GET /organizations/search/name/{name}", \
+            await self.client.get(f"/api/organizations/search/name/{self.rng.choice(NAME_WORDS)}")
+
+    async def search_activity(self):
+        return "GET /organizations/search/activity/{name}", \
+            await self.client.get(f"/api/organizations/search/activity/{self.rng.choice(self.dataset.activity_names)}")
+
+    async def search_phone(self):
+        return "GET /organizations/search/phone/{pattern}", \
+            await self.client.get(f"/api/organizations/search/phone/{self.rng.randint(100, 999)}")
+
+    async def search_comprehensive(self):
+        params = {"name": self.rng.choice(NAME_WORDS)}
+        if self.rng.random() < 0.5:
+            params["activity_id"] = self.rng.choice(self.dataset.activity_ids)
+        return "GET /organizations/search/comprehensive/", \
+            await self.client.get("/api/organizations/search/comprehensive/", params=params)
+
+    async def organizations_by_activity(self):
+        return "GET /organizations/activity/{id}", \
+            await self.client.get(f"/api/organizations/activity/{self.rng.choice(self.dataset.activity_ids)}")
+
+    async def organization_detail(self):
+        organization_id = self.rng.choice(self.dataset.organization_ids)
+        return "GET /organizations/{id}", await self._revalidating_get(f"/api/organizations/{organization_id}")
+
+    async def organization_list(self):
+        params = {"skip": self.rng.randrange(0, max(len(self.dataset.organization_ids) - 100, 1)), "limit": 100}
+        if self.rng.random() < 0.5:
+            params["format"] = "normalized"
+        return "GET /organizations/", await self.client.get("/api/organizations/", params=params)
+
+    async def activity_tree(self):
+        return "GET /activities/tree", await self._revalidating_get("/api/activities/tree")
+
+    # Map browsing operations
+
+    async def search_rectangle(self):
+        center = self._point()
+        half = self.rng.choice([0.005, 0.01, 0.02, 0.05])
+        body = {
+            "north_east": {"latitude": center["latitude"] + half, "longitude": center["longitude"] + half},
+            "south_west": {"latitude": center["latitude"] - half, "longitude": center["longitude"] - half},
+        }
+        return "POST /organizations/search/rectangle", \
+            await self.client.post("/api/organizations/search/rectangle", json=body)
+
+    async def search_radius(self):
+        body = {"center": self._point(), "radius_km": self.rng.choice([0.5, 1, 2, 5])}
+        return "POST /organizations/search/radius", \
+            await self.client.post("/api/organizations/search/radius", json=body)
+
+    async def search_nearest(self):
+        body = {"center": self._point(), "limit": self.rng.choice([5, 10, 20])}
+        return "POST /organizations/search/nearest", \
+            await self.client.post("/api/organizations/search/nearest", json=body)
+
+    async def organizations_by_building(self):
+        return "GET /organizations/building/{id}", \
+            await self.client.get(f"/api/organizations/building/{self.rng.choice(self.dataset.building_ids)}")
+
+    async def building_detail(self):
+        return "GET /buildings/{id}", \
+            await self.client.get(f"/api/buildings/{self.rng.choice(self.dataset.building_ids)}")
+
+    async def building_list(self):
+        return "GET /buildings/", await self._revalidating_get("/api/buildings/", params={"limit": 1000})
+
+    # Write operations, touching only organizations this user created
+
+    def _organization_body(self):
+        return {
+            "name": _organization_name(self.rng, self.rng.randint(0, 10 ** 6)),
+            "building_id": self.rng.choice(self.dataset.building_ids),
+            "phone_numbers": [_phone(self.rng) for _ in range(self.rng.randint(1, 3))],
+            "activity_ids": self.rng.sample(self.dataset.activity_ids, self.rng.randint(1, 3)),
+        }
+
+    async def create_organization(self):
+        response = await self.client.post("/api/organizations/", json=self._organization_body())
+        if response.status_code == 200:
+            self.created.append(response.json()["id"])
+        return "POST /organizations/", response
+
+    async def update_organization(self):
+        if not self.created:
+            return await self.create_organization()
+        organization_id = self.rng.choice(self.created)
+        return "PUT /organizations/{id}", \
+            await self.client.put(f"/api/organizations/{organization_id}", json=self._organization_body())
+
+    async def delete_organization(self):
+        if not self.created:
+            return await self.create_organization()
+        organization_id = self.created.pop(self.rng.randrange(len(self.created)))
+        return "DELETE /organizations/{id}", await self.client.delete(f"/api/organizations/{organization_id}")
+
+    async def upsert_organizations(self):
+        body = [
+            dict(self._organization_body(), external_id=f"load-test-{self.rng.randrange(DATASET_ORGANIZATIONS)}")
+            for _ in range(self.rng.choice([10, 50, 100]))
+        ]
+        return "PUT /organizations/", await self.client.put("/api/organizations/", json=body)
+
+
+# Weighted operation mixes; weights are relative frequencies
+PROFILES = {
+    "search": [
+        (25, VirtualUser.search_name),
+        (20, VirtualUser.search_comprehensive),
+        (15, VirtualUser.search_activity),
+        (10, VirtualUser.search_phone),
+        (10, VirtualUser.organizations_by_activity),
+        (10, VirtualUser.organization_detail),
+        (5, VirtualUser.organization_list),
+        (5, VirtualUser.activity_tree),
+    ],
+    "write": [
+        (25, VirtualUser.create_organization),
+        (25, VirtualUser.update_organization),
+        (10, VirtualUser.delete_organization),
+        (5, VirtualUser.upsert_organizations),
+        (20, VirtualUser.organization_detail),
+        (15, VirtualUser.search_name),
+    ],
+    "map": [
+        (35, VirtualUser.search_rectangle),
+        (15, VirtualUser.search_radius),
+        (15, VirtualUser.search_nearest),
+        (15, VirtualUser.organizations_by_building),
+        (10, VirtualUser.building_detail),
+        (5, VirtualUser.building_list),
+        (5, VirtualUser.organization_detail),
+    ],
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p90_ms": percentile(latencies, 0.90),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+async def run_user(user, operations, weights, deadline, measure_from, samples):
+    while time.monotonic() < deadline:
+        operation = user.rng.choices(operations, weights)[0]
+        started = time.monotonic()
+        try:
+            label, response = await operation(user)
+            ok = response.status_code < 400
+        except httpx.HTTPError as exc:
+            label, ok = f"{operation.__name__} ({type(exc).__name__})", False
+        finished = time.monotonic()
+        if started >= measure_from:
+            samples[label].append(((finished - started) * 1000, ok))
+        if THINK_TIME_MS:
+            await asyncio.sleep(user.rng.expovariate(1000 / THINK_TIME_MS))
+
+
+async def run_profile(name, dataset):
+    operations = [operation for _, operation in PROFILES[name]]
+    weights = [weight for weight, _ in PROFILES[name]]
+    samples = defaultdict(list)
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+
+    async with httpx.AsyncClient(base_url=BASE_URL, headers={"X-API-Key": API_KEY},
+                                 limits=limits, timeout=TIMEOUT) as client:
+        started = time.monotonic()
+        measure_from = started + WARMUP
+        deadline = measure_from + DURATION
+        users = [
+            VirtualUser(client, dataset, random.Random(f"{SEED}-{name}-{index}"))
+            for index in range(CONCURRENCY)
+        ]
+        await asyncio.gather(*[
+            run_user(user, operations, weights, deadline, measure_from, samples) for user in users
+        ])
+        elapsed = time.monotonic() - measure_from
+
+    routes = {label: summarize(route_samples, elapsed) for label, route_samples in sorted(samples.items())}
+    total = summarize([sample for route_samples in samples.values() for sample in route_samples], elapsed)
+    return {"profile": name, "duration_s": elapsed, "total": total, "routes": routes}
+
+
+def print_report(report):
+    print(f"\nprofile: {report['profile']}  concurrency: {CONCURRENCY}  duration: {report['duration_s']:.1f} s  seed: {SEED}")
+    print(f"{'route':<48} {'reqs':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for label, stats in rows:
+        print(
+            f"{label:<48} {stats['requests']:>7} {stats['rps']:>8.1f} {stats['error_rate'] * 100:>6.2f}"
+            f" {stats['p50_ms']:>8.1f} {stats['p90_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f}"
+        )
+
+
+def start_server():
+    port = httpx.URL(BASE_URL).port or 8000
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port))
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, "scripts", "serve.py")], cwd=ROOT_DIR, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            httpx.get(f"{BASE_URL}/api/activities/tree", headers={"X-API-Key": API_KEY}, timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start within 60 s")
+
+
+async def load_test(profiles):
+    async with httpx.AsyncClient(base_url=BASE_URL, headers={"X-API-Key": API_KEY}, timeout=120) as client:
+        dataset = await prepare_dataset(client)
+    return [await run_profile(name, dataset) for name in profiles]
+
+
+def main():
+    profiles = sys.argv[1:] or list(PROFILES)
+    unknown = [name for name in profiles if name not in PROFILES]
+    if unknown:
+        sys.exit(f"Unknown profile(s): {', '.join(unknown)}; available: {', '.join(PROFILES)}")
+
+    server = start_server() if SERVE else None
+    try:
+        reports = asyncio.run(load_test(profiles))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    for report in reports:
+        print_report(report)
+    if OUTPUT:
+        with open(OUTPUT, "w") as output:
+            json.dump({
+                "concurrency": CONCURRENCY,
+                "seed": SEED,
+                "think_time_ms": THINK_TIME_MS,
+                "reports": reports,
+            }, output, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
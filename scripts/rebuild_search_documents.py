@@ -0,0 +1,17 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.database import SessionLocal
+from app.dao import search_documents
+
+def rebuild():
+    db = SessionLocal()
+    try:
+        written = search_documents.rebuild_documents(db)
+        print(f"Rebuilt {written} organization documents")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import uvicorn
+from alembic import command
+from alembic.config import Config
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "true").lower() == "true"
+
+def run_migrations():
+    from sqlalchemy import inspect
+    from app.database import engine
+    from app import models
+
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT_DIR, "alembic"))
+
+    # The migration history starts from an existing schema, so an empty database is created and stamped
+    # instead; the models declare everything the migrations add (pg_trgm, operator class indexes)
+    if not inspect(engine).has_table("organizations"):
+        models.Base.metadata.create_all(bind=engine)
+        command.stamp(config, "head")
+    else:
+        command.upgrade(config, "head")
+    engine.dispose()
+
+def serve():
+    # Workers inherit the environment, so pool sizing in app.database sees the real worker count
+    os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+    os.environ.setdefault("AUTO_CREATE_TABLES", "false")
+    os.environ.setdefault("DB_ECHO", "false")
+
+    if RUN_MIGRATIONS:
+        run_migrations()
+
+    uvicorn.run(
+        "app.main:app",
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        loop="auto",
+        http="auto",
+        proxy_headers=True,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,253 @@
+"""Fixtures for the performance suite: app on a throwaway SQLite file (or TEST_DATABASE_URL) and a generated dataset"""
+import os
+import random
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+_data_dir = tempfile.mkdtemp(prefix="directory-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_data_dir}/directory.db"
+os.environ["API_KEY"] = "test-api-key"
+os.environ["PROFILING_TOKEN"] = "test-profiling-token"
+os.environ["PROFILING_DIR"] = os.path.join(_data_dir, "profiles")
+os.environ["DB_ECHO"] = "false"
+os.environ["AUTO_CREATE_TABLES"] = "true"
+os.environ.pop("SNAPSHOT_PATH", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+# Cross-worker freshness checks are a per-interval cost; keep them out of per-request budgets
+for _poll in ("ACTIVITY_INDEX_POLL_SECONDS", "BUILDING_INDEX_POLL_SECONDS", "SUGGEST_INDEX_POLL_SECONDS"):
+    os.environ[_poll] = "3600"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app import models, schemas
+from app.dao import dao, search_documents
+from app.database import SessionLocal, engine
+from app.main import app
+
+API_HEADERS = {"x-api-key": "test-api-key"}
+
+SEED = 20240601
+BUILDINGS = int(os.getenv("PERF_BUILDINGS", "2000"))
+ORGANIZATIONS = int(os.getenv("PERF_ORGANIZATIONS", "6000"))
+CENTER = (55.7558, 37.6173)
+SPREAD_DEGREES = 0.3
+WORDS = [
+    "Альфа", "Вектор", "Гранит", "Дельта", "Енисей", "Заря", "Исток", "Кедр", "Лотос", "Меридиан",
+    "Нева", "Омега", "Прима", "Радуга", "Сигма", "Титан", "Урал", "Феникс", "Хронос", "Цитадель",
+]
+FORMS = ["ООО", "ЗАО", "ИП", "АО"]
+ACTIVITY_ROOTS = ["Еда", "Автомобили", "IT услуги", "Строительство", "Медицина", "Образование"]
+IMPORT_BATCH_SIZE = 500
+
+
+@dataclass
+class Dataset:
+    """Ids and search terms of the generated directory, for building requests"""
+    building_ids: List[int]
+    activity_ids: List[int]
+    root_activity_id: int
+    organization_ids: List[int]
+    center: Tuple[float, float] = CENTER
+    name_word: str = WORDS[0]
+    activity_name: str = ACTIVITY_ROOTS[0]
+
+    def format(self, path: str) -> str:
+        return path.format(
+            building_id=self.building_ids[0],
+            activity_id=self.activity_ids[-1],
+            root_activity_id=self.root_activity_id,
+            organization_id=self.organization_ids[0],
+        )
+
+
+def generate(db: Session) -> Dataset:
+    """Deterministic directory: buildings around CENTER, a three-level activity tree, organizations"""
+    rng = random.Random(SEED)
+
+    buildings = dao.upsert_buildings(db, [
+        schemas.BuildingCreate(
+            address=f"г. Москва, ул. {rng.choice(WORDS)}, д. {number}",
+            latitude=CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+            longitude=CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+        )
+        for number in range(1, BUILDINGS + 1)
+    ])
+    building_ids = sorted(row["id"] for row in buildings)
+
+    activity_ids = []
+    root_activity_id = None
+    for root_name in ACTIVITY_ROOTS:
+        root = dao.create_activity(db, schemas.ActivityCreate(name=root_name))
+        root_activity_id = root_activity_id or root.id
+        activity_ids.append(root.id)
+        for child_number in range(1, 6):
+            child = dao.create_activity(db, schemas.ActivityCreate(name=f"{root_name} {child_number}", parent_id=root.id))
+            activity_ids.append(child.id)
+            for leaf_number in range(1, 5):
+                leaf = dao.create_activity(
+                    db, schemas.ActivityCreate(name=f"{root_name} {child_number}.{leaf_number}", parent_id=child.id)
+                )
+                activity_ids.append(leaf.id)
+
+    records = [
+        schemas.OrganizationUpsert(
+            external_id=f"perf-{number}",
+            name=f'{rng.choice(FORMS)} "{rng.choice(WORDS)} {number}"',
+            building_id=rng.choice(building_ids),
+            phone_numbers=[
+                f"+7 (495) {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}"
+                for _ in range(rng.randint(1, 3))
+            ],
+            activity_ids=rng.sample(activity_ids, rng.randint(1, 3)),
+        )
+        for number in range(1, ORGANIZATIONS + 1)
+    ]
+    organization_ids = []
+    for start in range(0, len(records), IMPORT_BATCH_SIZE):
+        organization_ids.extend(row["id"] for row in dao.upsert_organizations(db, records[start:start + IMPORT_BATCH_SIZE]))
+
+    return Dataset(
+        building_ids=building_ids,
+        activity_ids=activity_ids,
+        root_activity_id=root_activity_id,
+        organization_ids=sorted(organization_ids),
+    )
+
+
+@pytest.fixture(scope="session")
+def client():
+    if engine.dialect.name != "sqlite":
+        models.Base.metadata.drop_all(bind=engine)
+    with TestClient(app, headers=API_HEADERS) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def dataset(client) -> Dataset:
+    db = SessionLocal()
+    try:
+        dataset = generate(db)
+        # Documents are written only while SEARCH_DOCUMENTS_ENABLED is on; the documents budgets turn it on per request
+        search_documents.rebuild_documents(db)
+        # Planner statistics, as a live database has them (autovacuum on PostgreSQL)
+        db.execute(text("ANALYZE"))
+        db.commit()
+        return dataset
+    finally:
+        db.close()
+
+
+@dataclass
+class Recorder:
+    """SQL statements and lazy loads of request handling; job worker threads are left out"""
+    statements: List[Tuple[str, object]] = field(default_factory=list)
+    lazy_loads: List[str] = field(default_factory=list)
+    active: bool = False
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __enter__(self):
+        self.statements.clear()
+        self.lazy_loads.clear()
+        self.active = True
+        return self
+
+    def __exit__(self, *exc_info):
+        self.active = False
+
+    def _counts(self) -> bool:
+        return self.active and not threading.current_thread().name.startswith("job")
+
+    def on_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if self._counts():
+            with self._lock:
+                self.statements.append((statement, parameters))
+
+    def on_orm_execute(self, state: ORMExecuteState):
+        if self._counts() and state.is_select and state.lazy_loaded_from is not None:
+            with self._lock:
+                self.lazy_loads.append(str(state.statement))
+
+    def report(self) -> str:
+        return "\n".join(f"{position + 1}. {statement}" for position, (statement, _) in enumerate(self.statements))
+
+
+@pytest.fixture(scope="session")
+def recorder():
+    recorder = Recorder()
+    event.listen(engine, "before_cursor_execute", recorder.on_statement)
+    event.listen(Session, "do_orm_execute", recorder.on_orm_execute)
+    yield recorder
+    event.remove(Session, "do_orm_execute", recorder.on_orm_execute)
+    event.remove(engine, "before_cursor_execute", recorder.on_statement)
+
+
+# Tables whose size grows with the directory; a full scan of one of them is a regression
+# wherever the budget asks for indexed access
+GROWING_TABLES = {
+    "buildings", "organizations", "organization_phones", "organization_activities", "organization_documents",
+}
+
+
+def _region_only(condition: str) -> bool:
+    """An index probe on the region alone still reads the whole region"""
+    return "region" in condition and " AND " not in condition.upper()
+
+
+def _scanned_tables_sqlite(connection, statement, parameters) -> List[str]:
+    scans = []
+    for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+        detail = row[-1]
+        words = detail.split()
+        if len(words) < 2 or words[0] not in ("SCAN", "SEARCH") or words[1] not in GROWING_TABLES:
+            continue
+        # "SCAN organizations" or "SCAN organizations USING INDEX ..." both read every row
+        if words[0] == "SCAN" or _region_only(detail[detail.find("("):]):
+            scans.append(detail)
+    return scans
+
+
+def _scanned_tables_postgresql(connection, statement, parameters) -> List[str]:
+    # With sequential scans priced out, one still chosen means no index can serve the query
+    connection.exec_driver_sql("SET enable_seqscan = off")
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    scans = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        relation = node.get("Relation Name")
+        if relation in GROWING_TABLES:
+            condition = node.get("Index Cond") or node.get("Recheck Cond")
+            if node["Node Type"] == "Seq Scan" or (condition and _region_only(condition)):
+                scans.append(f"{node['Node Type']} on {relation}")
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def full_scans(statements) -> List[str]:
+    """Full scans of growing tables in the plans of the recorded SELECTs"""
+    scanned = _scanned_tables_sqlite if engine.dialect.name == "sqlite" else _scanned_tables_postgresql
+    found = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                found.extend(f"{scan}: {statement}" for scan in scanned(connection, statement, parameters))
+        connection.rollback()
+    return found
+
+
+def timed(call, repeat: int) -> Tuple[object, float]:
+    """Median wall time of `repeat` calls in milliseconds, with the last result"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        durations.append((time.perf_counter() - started) * 1000)
+    durations.sort()
+    return result, durations[len(durations) // 2]
@@ -0,0 +1,44 @@
+"""Conditional GETs: weak ETags, 304s and the region in the validator."""
+REGION = {"X-Region": "etag-test"}
+
+
+def test_organization_revalidates_until_it_changes(client):
+    building = client.post("/api/buildings/", headers=REGION, json={
+        "address": "Etag 1", "latitude": 1.0, "longitude": 1.0
+    }).json()
+    organization = client.post("/api/organizations/", headers=REGION, json={
+        "name": "Etag", "building_id": building["id"], "phone_numbers": [], "activity_ids": []
+    }).json()
+    path = f"/api/organizations/{organization['id']}"
+
+    response = client.get(path, headers=REGION)
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert client.get(path, headers={**REGION, "If-None-Match": etag}).status_code == 304
+    # A weak validator matches its strong form as well
+    assert client.get(path, headers={**REGION, "If-None-Match": etag[2:]}).status_code == 304
+
+    assert client.put(path, headers=REGION, json={"name": "Etag renamed"}).status_code == 200
+    response = client.get(path, headers={**REGION, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["name"] == "Etag renamed"
+
+
+def test_region_header_is_normalized_in_the_validator(client, dataset):
+    path = f"/api/organizations/{dataset.organization_ids[0]}"
+    etag = client.get(path).headers["ETag"]
+
+    response = client.get(path, headers={"X-Region": " Default ", "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def test_buildings_list_is_cacheable_privately(client, dataset):
+    response = client.get("/api/buildings/", params={"limit": 10})
+
+    assert response.headers["Cache-Control"] == "private, max-age=60"
+    assert client.get(
+        "/api/buildings/", params={"limit": 10}, headers={"If-None-Match": response.headers["ETag"]}
+    ).status_code == 304
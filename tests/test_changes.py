@@ -0,0 +1,61 @@
+"""The change feed: one entry per committed write, and nothing for a write that failed."""
+import json
+
+import pytest
+
+from app.dao import dao
+
+REGION = {"X-Region": "changes-test"}
+
+
+def _feed(client, since: int = 0):
+    response = client.get("/api/changes/", headers=REGION, params={"since": since})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_feed_follows_organization_writes(client):
+    since = max([change["seq"] for change in _feed(client)], default=0)
+    building = client.post("/api/buildings/", headers=REGION, json={
+        "address": "Changes 1", "latitude": 1.0, "longitude": 1.0
+    }).json()
+    organization = client.post("/api/organizations/", headers=REGION, json={
+        "name": "Changes", "building_id": building["id"], "phone_numbers": ["1-111-111"], "activity_ids": []
+    }).json()
+    path = f"/api/organizations/{organization['id']}"
+    client.put(path, headers=REGION, json={"name": "Changes renamed"})
+    client.delete(path, headers=REGION)
+
+    changes = _feed(client, since)
+
+    assert [(change["entity"], change["entity_id"], change["operation"]) for change in changes] == [
+        ("building", building["id"], "insert"),
+        ("organization", organization["id"], "insert"),
+        ("organization", organization["id"], "update"),
+        ("organization", organization["id"], "delete"),
+    ]
+    assert [change["seq"] for change in changes] == sorted(change["seq"] for change in changes)
+    assert _feed(client, changes[-1]["seq"]) == []
+
+
+def test_failed_update_changes_nothing(client, monkeypatch):
+    building = client.post("/api/buildings/", headers=REGION, json={
+        "address": "Changes 2", "latitude": 1.0, "longitude": 1.0
+    }).json()
+    organization = client.post("/api/organizations/", headers=REGION, json={
+        "name": "Atomic", "building_id": building["id"], "phone_numbers": ["2-222-222"], "activity_ids": []
+    }).json()
+    since = _feed(client)[-1]["seq"]
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("links failed")
+
+    # The phones are already rewritten when linking activities fails
+    monkeypatch.setattr(dao, "_link_activities", fail)
+    with pytest.raises(RuntimeError):
+        client.put(f"/api/organizations/{organization['id']}", headers=REGION, json={
+            "name": "Half applied", "phone_numbers": ["3-333-333"], "activity_ids": []
+        })
+
+    assert client.get(f"/api/organizations/{organization['id']}", headers=REGION).json() == organization
+    assert _feed(client, since) == []
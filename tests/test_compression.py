@@ -0,0 +1,25 @@
+"""Negotiated response compression decodes to the identity body."""
+import pytest
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_list_is_compressed_when_accepted(client, dataset, encoding):
+    if encoding == "br":
+        pytest.importorskip("brotli")
+    params = {"limit": 100}
+    identity = client.get("/api/organizations/", params=params, headers={"Accept-Encoding": "identity"})
+
+    response = client.get("/api/organizations/", params=params, headers={"Accept-Encoding": encoding})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in identity.headers
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(identity.content)
+    assert response.json() == identity.json()
+
+
+def test_small_bodies_stay_uncompressed(client, dataset):
+    response = client.get(f"/api/buildings/{dataset.building_ids[0]}", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
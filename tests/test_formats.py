@@ -0,0 +1,43 @@
+"""Response shapes: the normalized organization list and faceted search."""
+
+
+def test_normalized_list_side_loads_buildings_and_activities(client, dataset):
+    params = {"limit": 50}
+    full = client.get("/api/organizations/", params=params).json()
+
+    response = client.get("/api/organizations/", params={**params, "format": "normalized"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"organizations", "buildings", "activities"}
+    assert [organization["id"] for organization in body["organizations"]] == [organization["id"] for organization in full]
+    for nested, normalized in zip(full, body["organizations"]):
+        assert normalized["phone_numbers"] == nested["phone_numbers"]
+        assert normalized["activity_ids"] == [activity["id"] for activity in nested["activities"]]
+        assert body["buildings"][str(nested["building_id"])] == nested["building"]
+        for activity in nested["activities"]:
+            assert body["activities"][str(activity["id"])] == {
+                "id": activity["id"], "name": activity["name"], "parent_id": activity["parent_id"]
+            }
+
+
+def test_faceted_search_wraps_the_page(client, dataset):
+    params = {"name": dataset.name_word, "limit": 10}
+    page = client.get("/api/organizations/search/comprehensive/", params=params).json()
+
+    response = client.get("/api/organizations/search/comprehensive/", params={**params, "facets": True})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["organizations"] == page
+    assert body["facets"]["total"] >= len(page)
+    assert body["facets"]["buildings"] and body["facets"]["activities"]
+
+
+def test_openapi_describes_every_shape(client):
+    schemas = client.get("/openapi.json").json()["paths"]
+
+    listing = schemas["/api/organizations/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    search = schemas["/api/organizations/search/comprehensive/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert "#/components/schemas/NormalizedOrganizationList" in str(listing)
+    assert "FacetedOrganizationSearch" in str(search)
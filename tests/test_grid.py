@@ -0,0 +1,31 @@
+"""Grid statistics cell assignment, in a region of its own so the generated dataset stays out."""
+REGION = {"X-Region": "grid-test"}
+
+
+def test_points_belong_to_the_cell_they_fall_in(client):
+    for address, latitude, longitude in [
+        ("Grid 1", 2.6, 3.6),
+        ("Grid 2", 2.4, 3.4),
+        ("Grid 3", 10.0, 10.0),
+    ]:
+        building = client.post(
+            "/api/buildings/", headers=REGION, json={"address": address, "latitude": latitude, "longitude": longitude}
+        ).json()
+        response = client.post("/api/organizations/", headers=REGION, json={
+            "name": address, "building_id": building["id"], "phone_numbers": [], "activity_ids": []
+        })
+        assert response.status_code == 200, response.text
+
+    response = client.post("/api/organizations/stats/grid", headers=REGION, json={
+        "north_east": {"latitude": 10.0, "longitude": 10.0},
+        "south_west": {"latitude": 0.0, "longitude": 0.0},
+        "rows": 10,
+        "columns": 10,
+    })
+
+    assert response.status_code == 200, response.text
+    # x.6 of a cell stays in that cell; the far edge belongs to the last cell
+    assert [(cell["row"], cell["column"], cell["organization_count"]) for cell in response.json()] == [
+        (2, 3, 2),
+        (9, 9, 1),
+    ]
@@ -0,0 +1,106 @@
+"""Background jobs: cancellation, reclaiming jobs left running by a stopped process, payload limit."""
+import time
+from datetime import timedelta
+
+from app import jobs, models
+from app.config import settings
+from app.database import SessionLocal
+
+REGION = "jobs-test"
+
+
+def _insert_job(params: dict = None, **values) -> int:
+    """A job row as another (possibly dead) process would have left it, not handed to this process's workers"""
+    db = SessionLocal()
+    try:
+        job = models.Job(kind="delete_building", region=REGION, params=params or {"building_id": 0}, **values)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _resume() -> None:
+    db = SessionLocal()
+    try:
+        jobs.resume_queued(db)
+    finally:
+        db.close()
+
+
+def _wait(client, job_id: int) -> dict:
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] not in (jobs.QUEUED, jobs.RUNNING) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def _expired() -> dict:
+    long_ago = models.utcnow() - timedelta(seconds=settings.job_lease_seconds * 2)
+    return {"status": jobs.RUNNING, "started_at": long_ago, "heartbeat_at": long_ago}
+
+
+def test_queued_job_is_cancelled_at_once(client):
+    job_id = _insert_job(status=jobs.QUEUED)
+
+    job = client.post(f"/api/jobs/{job_id}/cancel").json()
+
+    assert job["status"] == jobs.CANCELLED
+    assert job["finished_at"] is not None
+
+
+def test_running_job_is_asked_to_cancel(client):
+    job_id = _insert_job(status=jobs.RUNNING, started_at=models.utcnow(), heartbeat_at=models.utcnow())
+
+    job = client.post(f"/api/jobs/{job_id}/cancel").json()
+
+    assert job["status"] == jobs.RUNNING
+    assert job["cancel_requested"] is True
+
+
+def test_expired_job_is_run_again(client):
+    headers = {"X-Region": REGION}
+    building = client.post("/api/buildings/", headers=headers, json={
+        "address": "Jobs 1", "latitude": 1.0, "longitude": 1.0
+    }).json()
+    client.post("/api/organizations/", headers=headers, json={
+        "name": "Jobs", "building_id": building["id"], "phone_numbers": [], "activity_ids": []
+    })
+    job_id = _insert_job(params={"building_id": building["id"]}, **_expired())
+
+    _resume()
+
+    job = _wait(client, job_id)
+    assert job["status"] == jobs.SUCCEEDED, job
+    assert job["result"] == {"deleted_organizations": 1}
+    assert client.get(f"/api/buildings/{building['id']}", headers=headers).status_code == 404
+
+
+def test_expired_job_asked_to_cancel_is_cancelled(client):
+    job_id = _insert_job(cancel_requested=True, **_expired())
+
+    _resume()
+
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == jobs.CANCELLED
+
+
+def test_job_within_its_lease_is_left_alone(client):
+    job_id = _insert_job(status=jobs.RUNNING, started_at=models.utcnow(), heartbeat_at=models.utcnow())
+
+    _resume()
+
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == jobs.RUNNING
+
+
+def test_oversized_params_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(settings, "job_max_params_bytes", 100)
+
+    response = client.post("/api/jobs/", json={
+        "kind": "import_organizations", "params": {"organizations": [{"name": "x" * 200}]}
+    })
+
+    assert response.status_code == 413
+
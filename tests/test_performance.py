@@ -0,0 +1,256 @@
+"""Per-endpoint budgets: SQL statements, lazy loads, full scans and, with PERF_TIME_SCALE set, response time"""
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import pytest
+
+from app.config import settings
+from conftest import CENTER, full_scans, timed
+
+# Wall time depends on the machine, so time budgets are checked only where PERF_TIME_SCALE is set
+TIME_SCALE = float(os.getenv("PERF_TIME_SCALE", "0"))
+CALIBRATE = os.getenv("PERF_CALIBRATE") == "1"
+READ_REPEAT = 5
+
+LAT, LON = CENTER
+SMALL_RECTANGLE = {
+    "north_east": {"latitude": LAT + 0.02, "longitude": LON + 0.03},
+    "south_west": {"latitude": LAT - 0.02, "longitude": LON - 0.03},
+}
+
+
+@dataclass
+class Budget:
+    name: str
+    method: str
+    path: str
+    statements: int
+    ms: float
+    params: Optional[Dict[str, Any]] = None
+    json: Any = None
+    # Every SELECT must reach growing tables through an index
+    indexed: bool = False
+    # Settings overridden for this request, e.g. the search documents read model
+    settings: Dict[str, Any] = field(default_factory=dict)
+    status: int = 200
+
+
+READ_BUDGETS = [
+    Budget("organizations list", "GET", "/api/organizations/", 5, 150, params={"limit": 100}),
+    Budget("organizations list normalized", "GET", "/api/organizations/", 5, 150, params={"limit": 100, "format": "normalized"}),
+    Budget("organization", "GET", "/api/organizations/{organization_id}", 6, 40, indexed=True),
+    Budget("organizations by building", "GET", "/api/organizations/building/{building_id}", 5, 40, indexed=True),
+    Budget("organizations by activity", "GET", "/api/organizations/activity/{activity_id}", 5, 100, indexed=True),
+    Budget("search radius", "POST", "/api/organizations/search/radius", 5, 150, indexed=True,
+           json={"center": {"latitude": LAT, "longitude": LON}, "radius_km": 1}),
+    Budget("search rectangle", "POST", "/api/organizations/search/rectangle", 5, 150, indexed=True, json=SMALL_RECTANGLE),
+    Budget("search nearest", "POST", "/api/organizations/search/nearest", 7, 150,
+           json={"center": {"latitude": LAT, "longitude": LON}, "limit": 10}),
+    Budget("search name", "GET", "/api/organizations/search/name/Альфа 1", 5, 150),
+    Budget("search activity name", "GET", "/api/organizations/search/activity/Еда 1.1", 5, 150),
+    Budget("search phone", "GET", "/api/organizations/search/phone/495 12", 6, 150),
+    Budget("search comprehensive", "GET", "/api/organizations/search/comprehensive/", 5, 150,
+           params={"name": "Альфа", "activity_id": "{root_activity_id}", "limit": 50}),
+    Budget("search comprehensive facets", "GET", "/api/organizations/search/comprehensive/", 6, 300,
+           params={"name": "Альфа", "activity_id": "{root_activity_id}", "limit": 50, "facets": "true"}),
+    Budget("stats activities", "GET", "/api/organizations/stats/activities", 2, 300),
+    Budget("stats buildings", "GET", "/api/organizations/stats/buildings", 1, 100, params={"limit": 100}),
+    Budget("stats grid", "POST", "/api/organizations/stats/grid", 1, 200, json={
+        "north_east": {"latitude": LAT + 0.3, "longitude": LON + 0.3},
+        "south_west": {"latitude": LAT - 0.3, "longitude": LON - 0.3},
+        "rows": 10, "columns": 10,
+    }),
+    Budget("buildings list", "GET", "/api/buildings/", 2, 60, params={"limit": 100}),
+    Budget("building", "GET", "/api/buildings/{building_id}", 1, 30, indexed=True),
+    Budget("activities list", "GET", "/api/activities/", 2, 60),
+    Budget("activity", "GET", "/api/activities/{root_activity_id}", 2, 30),
+    Budget("activities tree", "GET", "/api/activities/tree", 1, 60),
+    Budget("suggest", "GET", "/api/suggest", 0, 30, params={"q": "гран"}),
+    Budget("changes feed", "GET", "/api/changes/", 1, 300, params={"limit": 1000}),
+
+    Budget("documents list", "GET", "/api/organizations/", 1, 100, params={"limit": 100},
+           settings={"search_documents_enabled": True}),
+    Budget("documents by building", "GET", "/api/organizations/building/{building_id}", 1, 40, indexed=True,
+           settings={"search_documents_enabled": True}),
+    Budget("documents by activity", "GET", "/api/organizations/activity/{activity_id}", 1, 150,
+           settings={"search_documents_enabled": True}),
+    Budget("documents search name", "GET", "/api/organizations/search/name/Альфа 1", 1, 100,
+           settings={"search_documents_enabled": True}),
+    Budget("documents search comprehensive", "GET", "/api/organizations/search/comprehensive/", 1, 150,
+           params={"name": "Альфа", "activity_id": "{root_activity_id}", "limit": 50},
+           settings={"search_documents_enabled": True}),
+
+    Budget("index search radius", "POST", "/api/organizations/search/radius", 5, 100, indexed=True,
+           json={"center": {"latitude": LAT, "longitude": LON}, "radius_km": 1},
+           settings={"building_index_enabled": True}),
+    Budget("index search rectangle", "POST", "/api/organizations/search/rectangle", 5, 100, indexed=True,
+           json=SMALL_RECTANGLE, settings={"building_index_enabled": True}),
+    Budget("index search nearest", "POST", "/api/organizations/search/nearest", 5, 60, indexed=True,
+           json={"center": {"latitude": LAT, "longitude": LON}, "limit": 10},
+           settings={"building_index_enabled": True}),
+]
+
+
+def _format(value, dataset):
+    if isinstance(value, str):
+        return dataset.format(value)
+    if isinstance(value, dict):
+        return {key: _format(item, dataset) for key, item in value.items()}
+    return value
+
+
+def check_budget(budget: Budget, recorder, duration_ms: float) -> None:
+    if CALIBRATE:
+        print(f"\n{budget.name}: {len(recorder.statements)} statements, {duration_ms:.1f} ms")
+        return
+    assert not recorder.lazy_loads, f"{budget.name}: lazy loads\n" + "\n".join(recorder.lazy_loads)
+    assert len(recorder.statements) <= budget.statements, (
+        f"{budget.name}: {len(recorder.statements)} statements, budget {budget.statements}\n{recorder.report()}"
+    )
+    if budget.indexed:
+        scans = full_scans(recorder.statements)
+        assert not scans, f"{budget.name}: full scans\n" + "\n".join(scans)
+    if TIME_SCALE:
+        assert duration_ms <= budget.ms * TIME_SCALE, f"{budget.name}: {duration_ms:.1f} ms, budget {budget.ms * TIME_SCALE:.0f} ms"
+
+
+@pytest.mark.parametrize("budget", READ_BUDGETS, ids=lambda budget: budget.name)
+def test_read_budget(budget, client, dataset, recorder, monkeypatch):
+    for name, value in budget.settings.items():
+        monkeypatch.setattr(settings, name, value)
+
+    def call():
+        return client.request(
+            budget.method,
+            dataset.format(budget.path),
+            params=_format(budget.params, dataset),
+            json=budget.json,
+        )
+
+    response = call()
+    assert response.status_code == budget.status, response.text
+
+    with recorder:
+        response = call()
+    assert response.status_code == budget.status, response.text
+    _, duration_ms = timed(call, READ_REPEAT)
+    check_budget(budget, recorder, duration_ms)
+
+
+def _write(budget: Budget, client, recorder, **request):
+    with recorder:
+        response, duration_ms = timed(lambda: client.request(budget.method, budget.path, **request), 1)
+    assert response.status_code == budget.status, response.text
+    check_budget(budget, recorder, duration_ms)
+    return response
+
+
+def _building(client, number: int) -> dict:
+    return client.post("/api/buildings/", json={
+        "address": f"г. Москва, Тестовая ул., д. {number}", "latitude": LAT, "longitude": LON,
+    }).json()
+
+
+def _organization(client, dataset, building_id: int, name: str) -> dict:
+    return client.post("/api/organizations/", json={
+        "name": name, "building_id": building_id, "phone_numbers": ["+7 (495) 000-00-00"],
+        "activity_ids": dataset.activity_ids[:2],
+    }).json()
+
+
+def test_create_building_budget(client, dataset, recorder):
+    _write(Budget("create building", "POST", "/api/buildings/", 3, 60), client, recorder, json={
+        "address": "г. Москва, Бюджетная ул., д. 1", "latitude": LAT, "longitude": LON,
+    })
+
+
+def test_upsert_buildings_budget(client, dataset, recorder):
+    _write(Budget("upsert buildings", "PUT", "/api/buildings/", 4, 150), client, recorder, json=[
+        {"address": f"г. Москва, Пакетная ул., д. {number}", "latitude": LAT, "longitude": LON}
+        for number in range(50)
+    ])
+
+
+def test_create_activity_budget(client, dataset, recorder):
+    _write(Budget("create activity", "POST", "/api/activities/", 3, 40), client, recorder, json={
+        "name": "Бюджетная деятельность", "parent_id": dataset.root_activity_id,
+    })
+
+
+def test_create_organization_budget(client, dataset, recorder):
+    _write(Budget("create organization", "POST", "/api/organizations/", 12, 100), client, recorder, json={
+        "name": "ООО Бюджет", "building_id": dataset.building_ids[1],
+        "phone_numbers": ["+7 (495) 111-11-11", "+7 (495) 222-22-22"], "activity_ids": dataset.activity_ids[:2],
+    })
+
+
+def test_upsert_organizations_budget(client, dataset, recorder):
+    _write(Budget("upsert organizations", "PUT", "/api/organizations/", 8, 300), client, recorder, json=[
+        {
+            "external_id": f"budget-{number}", "name": f"ООО Пакет {number}", "building_id": dataset.building_ids[number],
+            "phone_numbers": ["+7 (495) 333-33-33"], "activity_ids": dataset.activity_ids[:2],
+        }
+        for number in range(50)
+    ])
+
+
+def test_update_organization_budget(client, dataset, recorder):
+    organization = _organization(client, dataset, dataset.building_ids[2], "ООО Обновление")
+    _write(Budget("update organization", "PUT", f"/api/organizations/{organization['id']}", 12, 100), client, recorder, json={
+        "name": "ООО Обновлено", "phone_numbers": ["+7 (495) 444-44-44"], "activity_ids": dataset.activity_ids[2:4],
+    })
+
+
+def test_patch_organization_phones_budget(client, dataset, recorder):
+    organization = _organization(client, dataset, dataset.building_ids[3], "ООО Телефоны")
+    _write(Budget("patch phones", "PATCH", f"/api/organizations/{organization['id']}/phones", 6, 60), client, recorder, json={
+        "add": ["+7 (495) 555-55-55"], "remove": ["+7 (495) 000-00-00"],
+    })
+
+
+def test_patch_organization_activities_budget(client, dataset, recorder):
+    organization = _organization(client, dataset, dataset.building_ids[4], "ООО Деятельности")
+    _write(Budget("patch activities", "PATCH", f"/api/organizations/{organization['id']}/activities", 6, 60), client, recorder, json={
+        "add": dataset.activity_ids[5:7], "remove": dataset.activity_ids[:1],
+    })
+
+
+def test_delete_organization_budget(client, dataset, recorder):
+    organization = _organization(client, dataset, dataset.building_ids[5], "ООО Удаление")
+    _write(Budget("delete organization", "DELETE", f"/api/organizations/{organization['id']}", 2, 40), client, recorder)
+
+
+def test_delete_organizations_budget(client, dataset, recorder):
+    ids = [_organization(client, dataset, dataset.building_ids[6], f"ООО Удаление {number}")["id"] for number in range(10)]
+    response = _write(Budget("delete organizations", "DELETE", "/api/organizations/", 2, 40), client, recorder, params={"ids": ids})
+    assert sorted(response.json()["deleted_ids"]) == ids
+
+
+def test_delete_organizations_by_building_budget(client, dataset, recorder):
+    building = _building(client, 1)
+    for number in range(10):
+        _organization(client, dataset, building["id"], f"ООО В здании {number}")
+    _write(Budget("delete organizations by building", "DELETE", f"/api/organizations/building/{building['id']}", 2, 40), client, recorder)
+
+
+def test_delete_building_budget(client, dataset, recorder):
+    building = _building(client, 2)
+    for number in range(10):
+        _organization(client, dataset, building["id"], f"ООО Снос {number}")
+    _write(Budget("delete building", "DELETE", f"/api/buildings/{building['id']}", 7, 60), client, recorder)
+
+
+def test_jobs_budget(client, dataset, recorder):
+    job = _write(Budget("submit job", "POST", "/api/jobs/", 2, 60, status=202), client, recorder, json={
+        "kind": "delete_building", "params": {"building_id": 0},
+    }).json()
+    _write(Budget("read job", "GET", f"/api/jobs/{job['id']}", 1, 30), client, recorder)
+    _write(Budget("cancel job", "POST", f"/api/jobs/{job['id']}/cancel", 3, 30), client, recorder)
+
+
+def test_profile_download_budget(client, dataset, recorder):
+    profiled = client.get("/api/activities/tree", headers={"X-Profile": settings.profiling_token})
+    profile_id = profiled.headers["X-Profile-Id"]
+    _write(Budget("profile download", "GET", f"/api/profiles/{profile_id}", 0, 100), client, recorder,
+           headers={"X-Profile": settings.profiling_token})
@@ -0,0 +1,42 @@
+"""Regions: every read and write through the API stays inside the region named by X-Region."""
+import itertools
+
+_addresses = itertools.count(1)
+NORTH = {"X-Region": "north-test"}
+SOUTH = {"X-Region": "south-test"}
+
+
+def _create(client, headers: dict) -> tuple:
+    building = client.post("/api/buildings/", headers=headers, json={
+        "address": f"Regions {next(_addresses)}", "latitude": 10.0, "longitude": 10.0
+    }).json()
+    organization = client.post("/api/organizations/", headers=headers, json={
+        "name": "Regions", "building_id": building["id"], "phone_numbers": ["8-800-555-35-35"], "activity_ids": []
+    }).json()
+    return building, organization
+
+
+def test_rows_are_invisible_from_another_region(client):
+    building, organization = _create(client, NORTH)
+
+    assert client.get(f"/api/organizations/{organization['id']}", headers=NORTH).status_code == 200
+    assert client.get(f"/api/organizations/{organization['id']}", headers=SOUTH).status_code == 404
+    assert client.get(f"/api/buildings/{building['id']}", headers=SOUTH).status_code == 404
+    assert client.get(f"/api/organizations/building/{building['id']}", headers=SOUTH).json() == []
+    south_names = client.get("/api/organizations/search/name/Regions", headers=SOUTH).json()
+    assert organization["id"] not in [item["id"] for item in south_names]
+
+
+def test_writes_cannot_reach_another_region(client):
+    building, organization = _create(client, NORTH)
+
+    response = client.post("/api/organizations/", headers=SOUTH, json={
+        "name": "Intruder", "building_id": building["id"], "phone_numbers": [], "activity_ids": []
+    })
+    assert response.status_code == 422
+    assert client.delete(f"/api/organizations/{organization['id']}", headers=SOUTH).status_code == 404
+    assert client.get(f"/api/organizations/{organization['id']}", headers=NORTH).status_code == 200
+
+
+def test_unknown_region_is_rejected(client):
+    assert client.get("/api/buildings/", headers={"X-Region": "not a region!"}).status_code == 400
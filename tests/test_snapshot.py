@@ -0,0 +1,52 @@
+"""Snapshot deployments: the directory is served from a read-only SQLite copy and writes get 405."""
+import pytest
+import itertools
+
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.dao import snapshot
+
+HEADERS = {"X-Region": "snapshot-test"}
+
+_addresses = itertools.count(1)
+
+
+@pytest.fixture
+def snapshot_client(client, tmp_path, monkeypatch):
+    building = client.post("/api/buildings/", headers=HEADERS, json={
+        "address": f"Snapshot {next(_addresses)}", "latitude": 20.0, "longitude": 20.0
+    }).json()
+    path = str(tmp_path / "snapshot.db")
+    source = database.SessionLocal()
+    try:
+        snapshot.build(source, path)
+    finally:
+        source.close()
+    engine = snapshot.create_engine_for(path)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    snapshot.guard(factory)
+    monkeypatch.setattr(database, "SessionLocal", factory)
+    yield client, building
+    engine.dispose()
+
+
+def test_snapshot_serves_reads(snapshot_client):
+    client, building = snapshot_client
+
+    response = client.get(f"/api/buildings/{building['id']}", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.json()["address"] == building["address"]
+
+
+def test_snapshot_rejects_writes(snapshot_client):
+    client, building = snapshot_client
+
+    created = client.post("/api/buildings/", headers=HEADERS, json={
+        "address": "Snapshot write", "latitude": 20.0, "longitude": 20.0
+    })
+    deleted = client.delete(f"/api/buildings/{building['id']}", headers=HEADERS)
+
+    assert created.status_code == 405
+    assert deleted.status_code == 405